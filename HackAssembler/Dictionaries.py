@@ -57,3 +57,13 @@ COMP_MAP = {
     'D&M': '1000000',
     'D|M': '1010101'
 }
+
+# Every legal C-instruction, dest=comp;jump with an optional dest and jump, by its text
+C_INSTRUCTION_MAP = {
+    (f'{dest}=' if dest else '') + comp + (f';{jump}' if jump is not None else ''):
+        '111' + COMP_MAP[comp] + DEST_MAP.get(dest, '000') + JUMP_MAP.get(jump, '000')
+    for dest in ['', *DEST_MAP] for comp in COMP_MAP for jump in [None, *JUMP_MAP]
+}
+
+# The same table with every C-instruction as its 16-bit integer
+C_INSTRUCTION_CODES = {instruction: int(binary, 2) for instruction, binary in C_INSTRUCTION_MAP.items()}
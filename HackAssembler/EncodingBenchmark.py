@@ -0,0 +1,62 @@
+import sys
+import time
+from Dictionaries import DEST_MAP, JUMP_MAP, COMP_MAP
+from Main import Assembler
+
+
+def read_c_instructions(asm_file, repeat):
+    """Returns the C-instructions of asm_file (the VM translator's output, for example) repeat times over"""
+    instructions = [line for line in Assembler(asm_file).read_lines() if not line.startswith(('@', '('))]
+    return instructions * repeat
+
+
+def split_c_instruction(instruction) -> str:
+    """Returns a C-instruction made from 16bits according to the Table from the lecture, field by field, the
+    encoding the table lookup replaced"""
+    prefix = '111'
+    dest = '000'
+    jump = '000'
+    if '=' in instruction:
+        split = instruction.split('=')
+        dest = DEST_MAP[split[0]]
+        instruction = split[1]
+    if ';' in instruction:
+        split = instruction.split(';')
+        jump = JUMP_MAP[split[1]]
+        instruction = split[0]
+    return prefix + COMP_MAP[instruction] + dest + jump
+
+
+def time_encode(instructions, encode, rounds):
+    """Returns the encoded instructions and the best time (in seconds) of encoding them with encode"""
+    best = float('inf')
+    encoded = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        encoded = [encode(instruction) for instruction in instructions]
+        best = min(best, time.perf_counter() - start)
+    return encoded, best
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print('Usage: EncodingBenchmark <path/to/file.asm> [repeat]')
+        sys.exit(1)
+    repeat = int(sys.argv[2]) if len(sys.argv) == 3 else 20
+    instructions = read_c_instructions(sys.argv[1], repeat)
+    if not instructions:
+        print('ERROR: no C-instructions to encode')
+        sys.exit(1)
+    split_encoded, split_time = time_encode(instructions, split_c_instruction, 5)
+    table_encoded, table_time = time_encode(instructions, Assembler.translate_c_instruction, 5)
+    if split_encoded != table_encoded:
+        print('ERROR: the encoders disagree')
+        sys.exit(2)
+    print(f'{len(instructions)} C-instructions, {len(set(instructions))} distinct')
+    print(f'split on = and ;:  {split_time:.4f}s ({len(instructions) / split_time:,.0f} instructions/s)')
+    print(f'C_INSTRUCTION_MAP: {table_time:.4f}s ({len(instructions) / table_time:,.0f} instructions/s)')
+    print(f'Speedup: {split_time / table_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
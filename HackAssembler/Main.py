@@ -1,104 +1,251 @@
+import argparse
+import glob
 import os, sys
-from Dictionaries import DEST_MAP, JUMP_MAP, COMP_MAP
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Iterable, Iterator
+from Dictionaries import C_INSTRUCTION_MAP, C_INSTRUCTION_CODES
+from Profiler import Profiler, DISABLED
 from SymbolTable import SymbolTable
 
+PACKED_CHUNK = 64 * 1024  # words encoded before they're written to a packed file
+MAX_ADDRESS = 0x7FFF  # an A-instruction holds a 15-bit address
+
 
 class Assembler:
-    def __init__(self, input_file):
+    def __init__(self, input_file, profiler=DISABLED):
         self.input_file = input_file
+        self.profiler = profiler
         self.output_file = input_file[:-3] + "hack"
+        self.packed_file = input_file[:-3] + "bin"
         self.instructions = []
         self.binary_instructions = []
         self.symbol_table = SymbolTable()
         self.next_variable_address = 16
 
-    def parse_file(self):
-        """Initializes @self.instructions list with cleand lines"""
+    def read_lines(self) -> Iterator[str]:
+        """Yields the cleaned lines of the input file, one at a time"""
         with open(self.input_file, 'r') as file_lines:
             for line in file_lines:
                 cleaned_line = line.split('//')[0]  # remove comments
                 cleaned_line = cleaned_line.strip()  # remove whitespaces
                 if cleaned_line:  # line isn't empty after cleaning
-                    self.instructions.append(cleaned_line)
+                    yield cleaned_line
 
-    def first_pass(self):
+    def parse_file(self):
+        """Initializes @self.instructions list with cleand lines"""
+        self.instructions.extend(self.read_lines())
+
+    def first_pass(self, instructions: Iterable[str]):
         """Iterates over @instructions and records jump addresses"""
         current_address = 0
-        for instruction in self.instructions:
+        for instruction in instructions:
             if instruction.startswith('(') and instruction.endswith(')'):
                 label = instruction[1:-1]
                 self.symbol_table.set_loop(label, current_address)
             else:
                 current_address += 1
+        self.profiler.count('instructions', current_address)
+
+    def second_pass(self, instructions: Iterable[str]) -> Iterator[str]:
+        """Translates @instructions into binary, one instruction at a time"""
+        for instruction in instructions:
+            if instruction.startswith('('):  # Label
+                continue
+            elif instruction.startswith('@'):  # A instruction
+                yield self.translate_a_instruction(instruction)
+            else:  # C instruction
+                yield self.translate_c_instruction(instruction)
 
-    def second_pass(self):
-        """Translates @instructions into binary"""
-        for instruction in self.instructions:
+    def encode_pass(self, instructions: Iterable[str]) -> Iterator[int]:
+        """Encodes @instructions into 16-bit integers, one instruction at a time"""
+        for instruction in instructions:
             if instruction.startswith('('):  # Label
                 continue
             elif instruction.startswith('@'):  # A instruction
-                self.binary_instructions.append(self.translate_a_instruction(instruction))
+                yield self.encode_a_instruction(instruction)
             else:  # C instruction
-                self.binary_instructions.append(self.translate_c_instruction(instruction))
+                yield C_INSTRUCTION_CODES[instruction]
 
     def create_hack_file(self):
         instructions = "\n".join(self.binary_instructions)
         with open(self.output_file, 'w') as file:
             file.write(instructions)
 
-    def translate_a_instruction(self, instruction: str) -> str:
-        """Returns an A-instruction string compromised of 0 and the address of @instruction as a 15bit String"""
+    def stream_hack_file(self, binary_instructions: Iterable[str]):
+        """Writes every binary instruction as soon as it's translated, in the same format as create_hack_file"""
+        binary_instructions = iter(binary_instructions)
+        with open(self.output_file, 'w') as file:
+            first = next(binary_instructions, None)
+            if first is not None:
+                file.write(first)
+                file.writelines('\n' + binary_instruction for binary_instruction in binary_instructions)
+
+    def create_packed_file(self, codes: Iterable[int], byteorder: str):
+        """Writes the encoded instructions as 16-bit words in byteorder ('little' or 'big'), a chunk at a time"""
+        codes = iter(codes)
+        with open(self.packed_file, 'wb') as file:
+            while words := array('H', islice(codes, PACKED_CHUNK)):
+                if byteorder != sys.byteorder:
+                    words.byteswap()
+                words.tofile(file)
+
+    def resolve_address(self, instruction: str) -> int:
+        """Returns the address of @instruction, a number or a symbol, which has to fit in its 15 bits"""
         symbol = instruction[1:]
         if symbol.isdigit():
             address = int(symbol)
         else:
             address = self.symbol_table.get_address(symbol)
-        return format(address, '016b')
+        if address > MAX_ADDRESS:
+            raise ValueError(f'Address of {instruction} doesn\'t fit in 15 bits: {address}')
+        return address
+
+    def translate_a_instruction(self, instruction: str) -> str:
+        """Returns an A-instruction string comprised of 0 and the address of @instruction as a 15bit String"""
+        return format(self.resolve_address(instruction), '016b')
+
+    def encode_a_instruction(self, instruction: str) -> int:
+        """Returns the A-instruction as an integer, which is its address"""
+        return self.resolve_address(instruction)
 
     @staticmethod
     def translate_c_instruction(instruction) -> str:
-        """Returns a C-instruction made from 16bits according to the Table from the lecture"""
-        prefix = '111'
-        dest = '000'
-        jump = '000'
-        if '=' in instruction:
-            split = instruction.split('=')
-            dest = DEST_MAP[split[0]]
-            instruction = split[1]
-        if ';' in instruction:
-            split = instruction.split(';')
-            jump = JUMP_MAP[split[1]]
-            instruction = split[0]
-        return prefix + COMP_MAP[instruction] + dest + jump
-
-    def assemble(self):
-        self.parse_file()
-        self.first_pass()
-        self.second_pass()
-        self.create_hack_file()
+        """Returns a C-instruction made from 16bits, looked up by its text in the table of every legal one"""
+        return C_INSTRUCTION_MAP[instruction]
 
+    def assemble(self, byteorder=None, instructions=None):
+        """Writes the .hack file, or the packed .bin file of 16-bit words in byteorder if one is given.
+        instructions, the cleaned lines of a program already in memory, are assembled instead of the input file"""
+        profiler = self.profiler
+        with profiler.stage('assembler.read'):
+            if instructions is None:
+                self.parse_file()
+            else:
+                self.instructions.extend(instructions)
+        with profiler.stage('assembler.first_pass'):
+            self.first_pass(self.instructions)
+        if byteorder is not None:
+            with profiler.stage('assembler.second_pass'):  # encodes and writes a chunk at a time
+                self.create_packed_file(self.encode_pass(self.instructions), byteorder)
+            return
+        with profiler.stage('assembler.second_pass'):
+            self.binary_instructions.extend(self.second_pass(self.instructions))
+        with profiler.stage('assembler.write'):
+            self.create_hack_file()
 
-if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print('Usage: Main.py <path/to/file.asm>')
-        sys.exit()
-
-    input_path = sys.argv[1]
-    if os.path.isfile(input_path):
-        if not input_path.endswith('.asm'):
-            print('Invalid file type, expected .asm')
-            sys.exit()
+    def assemble_streaming(self, byteorder=None):
+        """Assembles without holding the program in memory: the first pass reads the file for its labels and the
+        second pass reads it again, writing every instruction as it's translated. Only the symbol table is kept"""
+        profiler = self.profiler
+        with profiler.stage('assembler.first_pass'):
+            self.first_pass(self.read_lines())
+        with profiler.stage('assembler.second_pass'):  # reads, translates and writes a line at a time
+            if byteorder is not None:
+                self.create_packed_file(self.encode_pass(self.read_lines()), byteorder)
+            else:
+                self.stream_hack_file(self.second_pass(self.read_lines()))
+
+
+def collect_files(paths) -> list:
+    """Returns the .asm files of every path: a file, a directory (its .asm files) or a glob pattern.
+    Raises ValueError for a path that matches no .asm file"""
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            if not path.endswith('.asm'):
+                raise ValueError(f'Invalid file type, expected .asm: {path}')
+            files.append(path)
+            continue
+        if os.path.isdir(path):
+            matches = [os.path.join(path, file) for file in sorted(os.listdir(path)) if file.endswith('.asm')]
         else:
-            print(f'Processing {input_path}...')
-            assembler = Assembler(os.path.join(input_path))
-            assembler.assemble()
-            print('Completed assembling')
-    else:
-        print('Error: Expected a file path')
-    # elif os.path.isdir(input_path):
-    #     for file in os.listdir(input_path):
-    #         if file.endswith('.asm'):
-    #             print(f'Processing {file}...')
-    #             assembler = Assembler(os.path.join(input_path, file))
-    #             assembler.assemble()
-    #     print('Completed assembling')
+            matches = sorted(file for file in glob.glob(path) if file.endswith('.asm') and os.path.isfile(file))
+        if not matches:
+            raise ValueError(f'No .asm files in {path}')
+        files.extend(matches)
+    return list(dict.fromkeys(files))  # a file matched by two paths is assembled once
+
+
+def assemble_file(file_path, stream=False, packed=None, profile=False) -> tuple:
+    """Assembles a single file. Returns the seconds it took, an error message (None on success) and the report of
+    its profile (None unless profile)"""
+    profiler = Profiler() if profile else DISABLED
+    profiler.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        assembler = Assembler(file_path, profiler)
+        if stream:
+            assembler.assemble_streaming(packed)
+        else:
+            assembler.assemble(packed)
+    except Exception as e:
+        error = f'{file_path}: {type(e).__name__}: {e}'
+    finally:
+        profiler.stop()
+    return time.perf_counter() - start, error, profiler.report() if profile else None
+
+
+def assemble_files(files, jobs=1, stream=False, packed=None, profile=False) -> list:
+    """Assembles every file, across a process pool when jobs > 1. Returns the (seconds, error, profile report) of
+    each file in the order of files"""
+    assemble = partial(assemble_file, stream=stream, packed=packed, profile=profile)
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(assemble, files))
+    return [assemble(file) for file in files]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='Assembler', fromfile_prefix_chars='@',
+        usage='Main.py <path/to/file.asm | dir | glob | @file_list> ... [--jobs N] [--stream] [--packed {little,big}] '
+              '[--profile [FILE]]')
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help='.asm files, directories or glob patterns. @FILE reads one path per line from FILE')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of files assembled in parallel')
+    parser.add_argument('--stream', action='store_true',
+                        help='read the file twice instead of holding it in memory, for very large files')
+    parser.add_argument('--packed', choices=['little', 'big'], metavar='{little,big}',
+                        help='write a .bin file of 16-bit words in this byte order instead of the .hack text')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='FILE',
+                        help='write the time and peak memory of every stage as JSON to FILE (printed without one)')
+    args = parser.parse_args()
+
+    try:
+        files = collect_files(args.paths)
+    except ValueError as e:
+        print(f'Error: {e}')
+        sys.exit(2)
+
+    if len(files) == 1:
+        print(f'Processing {files[0]}...')
+    start = time.perf_counter()
+    results = assemble_files(files, args.jobs, args.stream, args.packed, bool(args.profile))
+    elapsed = time.perf_counter() - start
+    errors = [error for _, error, _ in results if error is not None]
+    if len(files) > 1:
+        width = max(len(file) for file in files)
+        for file, (seconds, error, _) in zip(files, results):
+            print(f'{file:<{width}}  {seconds * 1000:8.1f} ms{"  FAILED" if error else ""}')
+        print(f'Assembled {len(files) - len(errors)} of {len(files)} files in {elapsed:.3f}s '
+              f'({sum(seconds for seconds, _, _ in results):.3f}s of assembling, {args.jobs} jobs)')
+    if args.profile:
+        profiler = Profiler()
+        for _, _, report in results:
+            profiler.merge(report)
+        profiler.count('files', len(files))
+        profiler.write_report(args.profile)
+    for error in errors:
+        print(f'Error: {error}')
+    if errors:
+        sys.exit(1)
+    print('Completed assembling')
+
+
+if __name__ == '__main__':
+    main()
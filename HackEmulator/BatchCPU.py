@@ -0,0 +1,105 @@
+import numpy as np
+from CPU import CPU, HALT, RAM_SIZE, ADDRESS_MASK, SIGN_BIT, read_program
+
+
+class BatchCPU:
+    """Runs many copies of one Hack program in lock-step. Every instance has its own registers and RAM, held as rows
+    of numpy arrays, and every step executes the current instruction of all the running instances at once with the
+    ALU's zx nx zy ny f no bits applied to whole columns.
+    ram_size must be a power of two, addresses wrap around it"""
+    def __init__(self, program, instances, ram_size=RAM_SIZE):
+        if ram_size & (ram_size - 1) or not 0 < ram_size <= RAM_SIZE:
+            raise ValueError(f'ram_size must be a power of two up to {RAM_SIZE}: {ram_size}')
+        self.instances = instances
+        self.ram_size = ram_size
+        self.address_mask = min(ram_size - 1, ADDRESS_MASK)
+        self.decode_program(program)
+        self.ram = np.zeros(instances * ram_size, dtype=np.uint16)
+        self.row_base = np.arange(instances, dtype=np.int64) * ram_size  # index of each instance's RAM[0]
+        self.a = np.zeros(instances, dtype=np.uint16)
+        self.d = np.zeros(instances, dtype=np.uint16)
+        self.pc = np.zeros(instances, dtype=np.int64)
+        self.cycles = np.zeros(instances, dtype=np.int64)
+        self.halted = np.zeros(instances, dtype=bool)
+
+    @classmethod
+    def load(cls, hack_file, instances, ram_size=RAM_SIZE, byteorder=None):
+        return cls(read_program(hack_file, byteorder), instances, ram_size)
+
+    def decode_program(self, program):
+        """Splits every instruction into columns of its fields, indexed by address.
+        The row after the last instruction, and the halt loops CPU recognizes, are marked as halts"""
+        rom = np.array(list(program) + [0], dtype=np.int64)
+        self.end = len(rom) - 1
+        self.halts = np.array([op[0] == HALT for op in CPU.decode_program(program)], dtype=bool)
+        self.halts[self.end] = True
+        self.is_a = (rom & SIGN_BIT) == 0
+        self.values = rom.astype(np.uint16)
+        c = ~self.is_a
+        self.reads_m = c & ((rom >> 12) & 1).astype(bool)
+        self.zx, self.nx, self.zy, self.ny, self.f, self.no = (
+            ((rom >> shift) & 1).astype(bool) for shift in range(11, 5, -1))
+        self.writes_a = c & ((rom >> 5) & 1).astype(bool)
+        self.writes_d = c & ((rom >> 4) & 1).astype(bool)
+        self.writes_m = c & ((rom >> 3) & 1).astype(bool)
+        self.jlt = c & ((rom >> 2) & 1).astype(bool)
+        self.jeq = c & ((rom >> 1) & 1).astype(bool)
+        self.jgt = c & (rom & 1).astype(bool)
+
+    def poke(self, address, values):
+        """Sets RAM[address] of every instance, values is one value or one per instance (negative values allowed)"""
+        self.check_address(address)
+        values = np.broadcast_to(np.asarray(values, dtype=np.int64), (self.instances,))
+        self.ram[self.row_base + address] = (values & 0xFFFF).astype(np.uint16)
+
+    def peek(self, address):
+        """Returns the signed RAM[address] of every instance"""
+        self.check_address(address)
+        return self.ram[self.row_base + address].view(np.int16)
+
+    def check_address(self, address):
+        if not 0 <= address < self.ram_size:
+            raise ValueError(f'RAM address out of range: {address}')
+
+    def run(self, max_instructions=None):
+        """Runs until every instance halted or max_instructions steps were taken.
+        Returns the number of instructions every instance executed"""
+        executed = np.zeros(self.instances, dtype=np.int64)
+        steps = 0
+        mask = self.address_mask
+        running = np.flatnonzero(~self.halts[self.pc])
+        self.halted[:] = self.halts[self.pc]
+        while running.size and (max_instructions is None or steps < max_instructions):
+            steps += 1
+            pc = self.pc[running]
+            a = self.a[running]
+            d = self.d[running]
+            address = self.row_base[running] + (a & mask)
+            # ALU: x = D, y = A or M
+            x = d
+            y = np.where(self.reads_m[pc], self.ram[address], a)
+            x = np.where(self.zx[pc], 0, x).astype(np.uint16)
+            x = np.where(self.nx[pc], ~x, x)
+            y = np.where(self.zy[pc], 0, y).astype(np.uint16)
+            y = np.where(self.ny[pc], ~y, y)
+            out = np.where(self.f[pc], x + y, x & y)
+            out = np.where(self.no[pc], ~out, out)
+            # stores, M uses A from before this instruction
+            writes_m = self.writes_m[pc]
+            self.ram[address[writes_m]] = out[writes_m]
+            self.d[running] = np.where(self.writes_d[pc], out, d)
+            is_a = self.is_a[pc]
+            self.a[running] = np.where(is_a, self.values[pc], np.where(self.writes_a[pc], out, a))
+            # jumps go to A from before this instruction
+            negative = out >= SIGN_BIT
+            zero = out == 0
+            jump = (self.jlt[pc] & negative) | (self.jeq[pc] & zero) | (self.jgt[pc] & ~negative & ~zero)
+            next_pc = np.where(jump, np.minimum(a & ADDRESS_MASK, self.end), pc + 1)
+            self.pc[running] = next_pc
+            executed[running] += 1
+            halted = self.halts[next_pc]
+            if halted.any():
+                self.halted[running[halted]] = True
+                running = running[~halted]
+        self.cycles += executed
+        return executed
@@ -0,0 +1,192 @@
+import sys
+from array import array
+
+RAM_SIZE = 32768  # the A register addresses the memory with its lower 15 bits
+ADDRESS_MASK = 0x7FFF
+WORD_MASK = 0xFFFF
+SIGN_BIT = 0x8000
+
+# ALU functions by their zx nx zy ny f no bits. x is D and y is A or M (by the a-bit), both unsigned 16-bit words
+ALU_MAP = {
+    0b101010: lambda x, y: 0,
+    0b111111: lambda x, y: 1,
+    0b111010: lambda x, y: WORD_MASK,
+    0b001100: lambda x, y: x,
+    0b110000: lambda x, y: y,
+    0b001101: lambda x, y: x ^ WORD_MASK,
+    0b110001: lambda x, y: y ^ WORD_MASK,
+    0b001111: lambda x, y: -x & WORD_MASK,
+    0b110011: lambda x, y: -y & WORD_MASK,
+    0b011111: lambda x, y: (x + 1) & WORD_MASK,
+    0b110111: lambda x, y: (y + 1) & WORD_MASK,
+    0b001110: lambda x, y: (x - 1) & WORD_MASK,
+    0b110010: lambda x, y: (y - 1) & WORD_MASK,
+    0b000010: lambda x, y: (x + y) & WORD_MASK,
+    0b010011: lambda x, y: (x - y) & WORD_MASK,
+    0b000111: lambda x, y: (y - x) & WORD_MASK,
+    0b000000: lambda x, y: x & y,
+    0b010101: lambda x, y: x | y,
+}
+
+# Jump conditions by the j1 j2 j3 bits, tested on the unsigned ALU output
+JUMP_MAP = {
+    0b000: None,
+    0b001: lambda out: 0 < out < SIGN_BIT,  # JGT
+    0b010: lambda out: out == 0,  # JEQ
+    0b011: lambda out: out < SIGN_BIT,  # JGE
+    0b100: lambda out: out >= SIGN_BIT,  # JLT
+    0b101: lambda out: out != 0,  # JNE
+    0b110: lambda out: out == 0 or out >= SIGN_BIT,  # JLE
+    0b111: True,  # JMP
+}
+
+# Operation kinds of the predecoded table
+A_INSTRUCTION = 0
+COMPUTE = 1  # a C-instruction without a jump
+JUMP = 2  # a C-instruction with a conditional jump
+GOTO = 3  # an unconditional jump, the ALU output can still be stored
+HALT = 4  # a jump to itself ((END) @END 0;JMP) or running past the end of the ROM
+
+
+def read_program(program_file, byteorder=None):
+    """Returns the instructions of a .hack file (one 16 character binary word per line), or of a packed .bin file
+    of 16-bit words if byteorder ('little' or 'big') is given"""
+    if byteorder is None:
+        with open(program_file, 'r') as file:
+            return [int(line, 2) for line in (line.strip() for line in file) if line]
+    words = array('H')
+    with open(program_file, 'rb') as file:
+        words.frombytes(file.read())
+    if byteorder != sys.byteorder:
+        words.byteswap()
+    return words
+
+
+def alu(bits):
+    """Returns the ALU function for any 6 control bits, following the chip's zx nx zy ny f no steps"""
+    if bits in ALU_MAP:
+        return ALU_MAP[bits]
+    zx, nx, zy, ny, f, no = ((bits >> shift) & 1 for shift in range(5, -1, -1))
+
+    def compute(x, y):
+        x = 0 if zx else x
+        x = x ^ WORD_MASK if nx else x
+        y = 0 if zy else y
+        y = y ^ WORD_MASK if ny else y
+        out = (x + y) & WORD_MASK if f else x & y
+        return out ^ WORD_MASK if no else out
+    return compute
+
+
+class CPU:
+    """Executes a Hack program. Every ROM word is decoded once into an operation tuple:
+    A-instruction: (A_INSTRUCTION, value)
+    C-instruction: (kind, alu function, reads M, writes M, writes D, writes A, jump condition)"""
+    def __init__(self, program):
+        self.rom = array('H', program)
+        self.ram = array('H', bytes(2 * RAM_SIZE))
+        self.ops = self.decode_program(self.rom)
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+
+    @classmethod
+    def load(cls, hack_file, byteorder=None):
+        """Creates a CPU running the program in a .hack file, or in a packed .bin file of byteorder words"""
+        return cls(read_program(hack_file, byteorder))
+
+    @staticmethod
+    def decode_program(rom):
+        """Decodes every instruction of rom, followed by a HALT for running past its end"""
+        ops = []
+        for address, instruction in enumerate(rom):
+            op = CPU.decode(instruction)
+            # (END) @END 0;JMP
+            if op[0] == GOTO and address > 0 and rom[address - 1] == address - 1 and op[3:6] == (False, False, False):
+                op = (HALT,)
+            ops.append(op)
+        ops.append((HALT,))
+        return ops
+
+    @staticmethod
+    def decode(instruction):
+        """Decodes a single 16-bit instruction into an operation tuple"""
+        if not instruction & SIGN_BIT:
+            return A_INSTRUCTION, instruction
+        reads_m = bool(instruction & 0x1000)
+        function = alu((instruction >> 6) & 0b111111)
+        writes_a, writes_d, writes_m = (bool(instruction & 0b100000), bool(instruction & 0b10000),
+                                        bool(instruction & 0b1000))
+        jump = JUMP_MAP[instruction & 0b111]
+        kind = COMPUTE if jump is None else GOTO if jump is True else JUMP
+        return kind, function, reads_m, writes_m, writes_d, writes_a, jump
+
+    def reset(self):
+        """Resets the registers, RAM is kept as is"""
+        self.a = self.d = self.pc = self.cycles = 0
+        self.halted = False
+
+    def run(self, max_instructions=None):
+        """Runs until the program halts or max_instructions were executed. Returns the number executed"""
+        ops, ram = self.ops, self.ram
+        end = len(ops) - 1  # jumps past the ROM land on the final HALT
+        a, d, pc = self.a, self.d, self.pc
+        remaining = -1 if max_instructions is None else max_instructions
+        while remaining:
+            remaining -= 1
+            op = ops[pc]
+            kind = op[0]
+            if kind == A_INSTRUCTION:
+                a = op[1]
+                pc += 1
+                continue
+            if kind == COMPUTE:
+                _, function, reads_m, writes_m, writes_d, writes_a, _ = op
+                out = function(d, ram[a & ADDRESS_MASK] if reads_m else a)
+                if writes_m:
+                    ram[a & ADDRESS_MASK] = out
+                if writes_d:
+                    d = out
+                if writes_a:
+                    a = out
+                pc += 1
+                continue
+            if kind == HALT:
+                self.halted = True
+                remaining += 1
+                break
+            _, function, reads_m, writes_m, writes_d, writes_a, jump = op
+            out = function(d, ram[a & ADDRESS_MASK] if reads_m else a)
+            address = a  # the jump goes to A as it was before this instruction
+            if writes_m:
+                ram[address & ADDRESS_MASK] = out
+            if writes_d:
+                d = out
+            if writes_a:
+                a = out
+            if kind == GOTO or jump(out):
+                pc = min(address & ADDRESS_MASK, end)
+            else:
+                pc += 1
+        if max_instructions is None:
+            executed = -1 - remaining
+        else:
+            executed = max_instructions - remaining
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        return executed
+
+    def peek(self, address):
+        """Returns the signed value of RAM[address]"""
+        value = self.ram[address]
+        return value - 0x10000 if value & SIGN_BIT else value
+
+    def poke(self, address, value):
+        """Sets RAM[address] to value, negative values are stored in two's complement"""
+        self.ram[address] = value & WORD_MASK
+
+    def dump(self, start, end):
+        """Returns (address, signed value) for every RAM address in [start, end)"""
+        return [(address, self.peek(address)) for address in range(start, end)]
@@ -0,0 +1,105 @@
+import argparse
+import sys
+import time
+from CPU import CPU, RAM_SIZE
+
+
+def parse_assignment(text):
+    """Parses ADDRESS=VALUE"""
+    address, value = text.split('=')
+    return int(address), int(value)
+
+
+def parse_range(text):
+    """Parses START:END (END excluded) or a single ADDRESS"""
+    if ':' in text:
+        start, end = text.split(':')
+        return int(start), int(end)
+    return int(text), int(text) + 1
+
+
+def read_batch(csv_file):
+    """Reads the initial RAM of every instance: a header row of addresses, then a row of values per instance"""
+    with open(csv_file, 'r') as file:
+        rows = [[int(cell) for cell in line.split(',')] for line in (line.strip() for line in file) if line]
+    return rows[0], rows[1:]
+
+
+def run_batch(args):
+    """Runs one instance of the program per row of the --batch file and prints the dumps of every instance"""
+    try:
+        from BatchCPU import BatchCPU
+    except ImportError:
+        print('Error: --batch requires numpy')
+        sys.exit(1)
+    addresses, rows = read_batch(args.batch)
+    try:
+        cpu = BatchCPU.load(args.path, len(rows), args.ram_size, args.byteorder)
+        for column, address in enumerate(addresses):
+            cpu.poke(address, [row[column] for row in rows])
+        dumps = [(address, cpu.peek(address)) for start, end in args.dump for address in range(start, end)]
+    except ValueError as e:
+        print(f'Error: {e}')
+        sys.exit(1)
+
+    start = time.perf_counter()
+    executed = cpu.run(args.max_instructions)
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(rows)} instances, {int(cpu.halted.sum())} halted, {int(executed.sum())} instructions')
+    print(f'{elapsed:.3f}s, {executed.sum() / elapsed if elapsed else 0:,.0f} instructions per second')
+    dumps = [(address, cpu.peek(address)) for address, _ in dumps]
+    for instance in range(len(rows)):
+        values = ' '.join(f'RAM[{address}]={int(column[instance])}' for address, column in dumps)
+        print(f'{instance}: {int(executed[instance])} instructions {values}')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='Emulator',
+        usage='Emulator <path/to/file.hack | file.bin> [--byteorder {little,big}] [--max-instructions N] '
+              '[--set ADDRESS=VALUE ...] [--dump START:END ...] [--batch INPUTS.csv [--ram-size WORDS]]')
+    parser.add_argument('path')
+    parser.add_argument('--byteorder', choices=['little', 'big'], default='little',
+                        help='byte order of the words of a packed .bin program (the assembler\'s --packed)')
+    parser.add_argument('-n', '--max-instructions', type=int, default=None,
+                        help='stop after N instructions (runs until the program halts by default)')
+    parser.add_argument('--set', type=parse_assignment, action='append', default=[], metavar='ADDRESS=VALUE',
+                        help='initial RAM value')
+    parser.add_argument('--dump', type=parse_range, action='append', default=[], metavar='START:END',
+                        help='RAM range printed after the run')
+    parser.add_argument('--batch', metavar='INPUTS.csv',
+                        help='run one instance per row, the header row holds the RAM addresses the rows set')
+    parser.add_argument('--ram-size', type=int, default=RAM_SIZE,
+                        help='RAM words of every --batch instance, a power of two')
+    args = parser.parse_args()
+    if not args.path.endswith(('.hack', '.bin')):
+        print('Invalid file type, expected .hack or .bin')
+        sys.exit(1)
+    if not args.path.endswith('.bin'):
+        args.byteorder = None  # a text .hack file
+    if args.batch:
+        run_batch(args)
+        return
+
+    cpu = CPU.load(args.path, args.byteorder)
+    for address, value in args.set:
+        if not 0 <= address < RAM_SIZE:
+            print(f'Error: RAM address out of range: {address}')
+            sys.exit(1)
+        cpu.poke(address, value)
+
+    start = time.perf_counter()
+    executed = cpu.run(args.max_instructions)
+    elapsed = time.perf_counter() - start
+
+    status = 'halted' if cpu.halted else 'instruction limit reached'
+    print(f'{status} after {executed} instructions, PC={cpu.pc} A={cpu.a} D={cpu.d}')
+    print(f'{elapsed:.3f}s, {executed / elapsed if elapsed else 0:,.0f} instructions per second')
+    for start, end in args.dump:
+        for address, value in cpu.dump(start, min(end, RAM_SIZE)):
+            print(f'RAM[{address}] = {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -13,42 +13,33 @@ class JackTokenizer:
         """
         self.file = open(file)
         self.currToken = ""
+        self.position = 0  # index of the next token in tokens
         self.lines = self.file.read()  # Read code
         self.removeComments()  # Remove comments
         self.tokens = self.tokenize()
         self.tokens = self.replaceSymbols()
 
     def removeComments(self):
-        """ Removes comments from the file string """
-        currentIndex = 0
-        filteredText = ''
-        endIndex = 0
-        while currentIndex < len(self.lines):
-            currentChar = self.lines[currentIndex]
-            if currentChar == "\"":
-                endIndex = self.lines.find("\"", currentIndex + 1)
-                filteredText += self.lines[currentIndex:endIndex + 1]
-                currentIndex = endIndex + 1
-            elif currentChar == "/":
-                if self.lines[currentIndex + 1] == "/":
-                    endIndex = self.lines.find("\n", currentIndex + 1)
-                    currentIndex = endIndex + 1
-                    filteredText += " "
-                elif self.lines[currentIndex + 1] == "*":
-                    endIndex = self.lines.find("*/", currentIndex + 1)
-                    currentIndex = endIndex + 2
-                    filteredText += " "
-                else:
-                    filteredText += self.lines[currentIndex]
-                    currentIndex += 1
-            else:
-                filteredText += self.lines[currentIndex]
-                currentIndex += 1
-        self.lines = filteredText
-        return
+        """ Removes comments from the file string in a single pass, keeping strings and line breaks """
+        self.lines = self.commentsRegex.sub(self.replaceComment, self.lines)
+
+    @staticmethod
+    def replaceComment(match):
+        text = match.group()
+        if text[0] == "\"":
+            return text
+        return " " + "\n" * text.count("\n")
 
     def tokenize(self):
-        return [self.token(word) for word in self.split(self.lines)]
+        tokens = []
+        self.tokenLines = []
+        line, lastIndex = 1, 0
+        for match in self.word.finditer(self.lines):
+            line += self.lines.count("\n", lastIndex, match.start())
+            lastIndex = match.start()
+            tokens.append(self.token(match.group()))
+            self.tokenLines.append(line)
+        return tokens
 
     def token(self, word):
         if re.match(self.keywordsRegex, word) != None:
@@ -69,6 +60,7 @@ class JackTokenizer:
     identifiersRegex = r'[\w]+'
     word = re.compile(
         keywordsRegex + '|' + symbolsRegex + '|' + integerRegex + '|' + stringsRegex + '|' + identifiersRegex)
+    commentsRegex = re.compile(stringsRegex + r'|//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
 
     def split(self, line):
         return self.word.findall(line)
@@ -93,7 +85,7 @@ class JackTokenizer:
         """
         do we have more tokens in the input?
         """
-        return self.tokens != []
+        return self.position < len(self.tokens)
 
     def advance(self):
         """
@@ -102,15 +94,29 @@ class JackTokenizer:
         should only be called if hasMoreTokens()
         is true. Initially there is no current token
         """
-        self.currToken = self.tokens.pop(0)
+        self.currToken = self.tokens[self.position]
+        self.position += 1
         return self.currToken
 
-    def peek(self):
-        if self.hasMoreTokens():
-            return self.tokens[0]
+    def peek(self, k=0):
+        """
+        returns the token k places after the next one
+        without advancing
+        """
+        index = self.position + k
+        if index < len(self.tokens):
+            return self.tokens[index]
         else:
             return ("ERROR", 0)
 
+    def getLine(self):
+        """
+        returns the line the current token starts on
+        """
+        if self.position == 0:
+            return 0
+        return self.tokenLines[self.position - 1]
+
     def getToken(self):
         """
         returns the type of the current token
@@ -0,0 +1,49 @@
+import argparse
+import sys
+import time
+from Pipeline import Pipeline, BuildError, profiling
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='Build',
+        usage='Build <path/to/dir | file.jack> [--optimize] [--trampolines] [--shared-comparisons] [--fuse] '
+              '[--packed {little,big}] [--dump {vm,asm} ...] [--profile [FILE]]')
+    parser.add_argument('path')
+    parser.add_argument('-O', '--optimize', action='store_true',
+                        help='fold the constant expressions of the classes, simplify their control flow and run the '
+                             'peephole optimizer over the assembly')
+    parser.add_argument('--trampolines', action='store_true',
+                        help='share one $$CALL and one $$RETURN routine between all the calls and returns')
+    parser.add_argument('--shared-comparisons', action='store_true',
+                        help='share one routine between all the eq, one between all the gt and one between all the lt '
+                             'commands: smaller than inlining them but slower')
+    parser.add_argument('--fuse', action='store_true',
+                        help='translate recurring command sequences (increments, array reads and writes, while '
+                             'loop exits) as superinstructions')
+    parser.add_argument('--packed', choices=['little', 'big'], metavar='{little,big}',
+                        help='write a .bin file of 16-bit words in this byte order instead of the .hack text')
+    parser.add_argument('--dump', choices=['vm', 'asm'], action='append', default=[],
+                        help='also write the .vm files of the classes or the .asm file of the program')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='FILE',
+                        help='write the time and peak memory of every stage as JSON to FILE (printed without one)')
+    args = parser.parse_args()
+
+    profiler = profiling.Profiler() if args.profile else profiling.DISABLED
+    pipeline = Pipeline(args.optimize, args.trampolines, args.shared_comparisons, args.fuse, args.dump, profiler)
+    profiler.start()
+    start = time.perf_counter()
+    try:
+        output = pipeline.build(args.path, args.packed)
+    except BuildError as e:
+        print(f'ERROR: {e}')
+        sys.exit(3)
+    finally:
+        profiler.stop()
+    print(f'Built {output} in {time.perf_counter() - start:.3f}s')
+    if args.profile:
+        profiler.write_report(args.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import importlib
+import os
+import sys
+from itertools import chain
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_modules(directory, *names):
+    """Imports the modules names from a directory of the repository and returns them.
+    The stages have modules of the same name (Main, SymbolTable, BuildCache), so every directory is first on
+    sys.path only while its modules are imported, and they're taken out of sys.modules afterwards. The modules that
+    imported them keep their references"""
+    directory = os.path.join(ROOT, directory)
+    local = {file[:-3] for file in os.listdir(directory) if file.endswith('.py')}
+    shadowed = {name: sys.modules.pop(name) for name in local if name in sys.modules}
+    sys.path.insert(0, directory)
+    try:
+        return [importlib.import_module(name) for name in names]
+    finally:
+        sys.path.remove(directory)
+        for name in local:
+            sys.modules.pop(name, None)
+        sys.modules.update(shadowed)
+
+
+compiler, tokenizer = load_modules('project11', 'CompilationEngine', 'JackTokenizer')
+translator, = load_modules('project8', 'Main')
+assembler, = load_modules('HackAssembler', 'Main')
+profiling, = load_modules('project8', 'Profiler')  # the stages only call its methods, any copy of it will do
+
+
+class BuildError(Exception):
+    pass
+
+
+class Pipeline:
+    """Builds Jack programs into Hack programs without going through the disk between the stages: the compiler's
+    token lists and VM command lists, the translator's assembly lines and the assembler's binary instructions are
+    handed to the next stage as they are.
+    dumps holds the intermediate outputs to write as well ('vm' next to every class, 'asm' next to the program).
+    Every stage records its time in profiler"""
+    def __init__(self, optimize=False, trampolines=False, shared_comparisons=False, fuse=False, dumps=(),
+                 profiler=profiling.DISABLED):
+        self.optimize = optimize
+        self.trampolines = trampolines
+        self.shared_comparisons = shared_comparisons
+        self.fuse = fuse
+        self.dumps = set(dumps)
+        self.profiler = profiler
+
+    def tokenize(self, jack_file, source=None):
+        """Returns the tokenizer of a .jack file, or of its source when it's given"""
+        return tokenizer.JackTokenizer(jack_file, source=source, profiler=self.profiler)
+
+    def compile(self, jack_file, source=None) -> list:
+        """Returns the VM commands of a .jack file. Raises BuildError with the line that failed"""
+        engine = None
+        try:
+            engine = compiler.CompilationEngine(jack_file, None, self.tokenize(jack_file, source), self.profiler,
+                                                self.optimize)
+            engine.compile_class()
+        except Exception as e:
+            line = f':{engine.line_number()}' if engine is not None else ''
+            raise BuildError(f'{jack_file}{line}: {type(e).__name__}: {e}') from e
+        commands = engine.VMwriter.commands
+        if 'vm' in self.dumps:
+            self.dump(jack_file[:-4] + 'vm', commands)
+        return commands
+
+    def translate(self, name, modules) -> list:
+        """Returns the assembly lines of the program made of modules, (file name, VM commands) pairs.
+        A program of more than one module starts with the bootstrap, as the translator's would"""
+        vm = translator.VMTranslator(name, None, self.optimize, self.trampolines, self.shared_comparisons, self.fuse,
+                                     profiler=self.profiler)
+        try:
+            with self.profiler.stage('translator.translate'):
+                lines = list(chain.from_iterable(vm.translate_sources(modules, len(modules) > 1, as_lines=True)))
+        except Exception as e:
+            raise BuildError(f'{name}: {type(e).__name__}: {e}') from e
+        self.profiler.count('vm_lines', vm.line_count)
+        self.profiler.count('instructions', vm.rom_size)
+        return lines
+
+    def assemble(self, asm_file, instructions, packed=None) -> str:
+        """Writes the .hack file of asm_file (the packed .bin one if packed is a byte order) from its assembly
+        lines. Returns the path written"""
+        hack_assembler = assembler.Assembler(asm_file, self.profiler)
+        try:
+            hack_assembler.assemble(packed, instructions)
+        except Exception as e:
+            raise BuildError(f'{asm_file}: {type(e).__name__}: {e}') from e
+        return hack_assembler.output_file if packed is None else hack_assembler.packed_file
+
+    def build(self, path, packed=None) -> str:
+        """Builds a .jack file, or a directory of .jack classes and of .vm files (the OS) to link with them,
+        into one program next to them. Returns the path written"""
+        if os.path.isdir(path):
+            directory = path.rstrip('/').rstrip('\\')
+            name = os.path.basename(os.path.abspath(directory))
+            files = sorted(os.listdir(directory))
+        elif os.path.isfile(path) and path.endswith('.jack'):
+            directory, file = os.path.split(path)
+            name = file[:-5]
+            files = [file]
+        else:
+            raise BuildError(f'Expected <path/to/dir | file.jack>; Gotten {path}')
+        jack_files = [file for file in files if file.endswith('.jack')]
+        if not jack_files:
+            raise BuildError(f'No .jack files in {path}')
+
+        modules = []
+        for file in files:
+            file_path = os.path.join(directory, file)
+            if file.endswith('.jack'):
+                modules.append((file[:-4] + 'vm', self.compile(file_path)))
+            elif file.endswith('.vm') and file[:-3] + '.jack' not in jack_files:
+                modules.append((file, list(translator.VMTranslator.read_lines(file_path))))
+
+        asm_file = os.path.join(directory, name + '.asm')
+        instructions = self.translate(name, modules)
+        if 'asm' in self.dumps:
+            self.dump(asm_file, instructions)
+        return self.assemble(asm_file, instructions, packed)
+
+    @staticmethod
+    def dump(file, lines):
+        with open(file, 'w') as out_file:
+            out_file.write('\n'.join(lines) + '\n')
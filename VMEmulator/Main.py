@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+from VM import VM, RAM_SIZE
+
+
+def parse_assignment(text):
+    """Parses ADDRESS=VALUE"""
+    address, value = text.split('=')
+    return int(address), int(value)
+
+
+def parse_range(text):
+    """Parses START:END (END excluded) or a single ADDRESS"""
+    if ':' in text:
+        start, end = text.split(':')
+        return int(start), int(end)
+    return int(text), int(text) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='VMEmulator',
+        usage='VMEmulator <path/to/dir | file.vm> [--bootstrap | --no-bootstrap] [--max-commands N] '
+              '[--no-fuse] [--fusion-report] [--set ADDRESS=VALUE ...] [--dump START:END ...]')
+    parser.add_argument('path')
+    parser.add_argument('--bootstrap', action=argparse.BooleanOptionalAction, default=None,
+                        help='set SP to 256 and call Sys.init first (by default only programs of several files are '
+                             'bootstrapped, as the translator does)')
+    parser.add_argument('--fuse', action=argparse.BooleanOptionalAction, default=True,
+                        help='run recurring command sequences as superinstructions (on by default)')
+    parser.add_argument('--fusion-report', action='store_true',
+                        help='print how often every superinstruction pattern was fused')
+    parser.add_argument('-n', '--max-commands', type=int, default=None,
+                        help='stop after N commands (runs until the program halts by default)')
+    parser.add_argument('--set', type=parse_assignment, action='append', default=[], metavar='ADDRESS=VALUE',
+                        help='initial RAM value')
+    parser.add_argument('--dump', type=parse_range, action='append', default=[], metavar='START:END',
+                        help='RAM range printed after the run')
+    args = parser.parse_args()
+
+    try:
+        vm = VM.load(args.path, args.bootstrap, args.fuse)
+    except ValueError as e:
+        print(f'Error: {e}')
+        sys.exit(1)
+    for address, value in args.set:
+        if not 0 <= address < RAM_SIZE:
+            print(f'Error: RAM address out of range: {address}')
+            sys.exit(1)
+        vm.poke(address, value)
+
+    start = time.perf_counter()
+    executed = vm.run(args.max_commands)
+    elapsed = time.perf_counter() - start
+
+    status = 'halted' if vm.halted else 'command limit reached'
+    print(f'{status} after {executed} commands, SP={vm.peek(0)}')
+    print(f'{elapsed:.3f}s, {executed / elapsed if elapsed else 0:,.0f} commands per second')
+    if args.fusion_report:
+        print('Superinstructions:')
+        for pattern in sorted(vm.fusion_sites):
+            print(f'  {pattern:<12} {vm.fusion_sites[pattern]:>6} sites, '
+                  f'{vm.fusion_saving[pattern]} dispatches (commands per run) saved')
+    for start, end in args.dump:
+        for address, value in vm.dump(start, min(end, RAM_SIZE)):
+            print(f'RAM[{address}] = {value}')
+
+
+if __name__ == '__main__':
+    main()
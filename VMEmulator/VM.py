@@ -0,0 +1,411 @@
+import os
+from array import array
+
+RAM_SIZE = 32768  # the same RAM the translated program runs in
+ADDRESS_MASK = 0x7FFF
+WORD_MASK = 0xFFFF
+SIGN_BIT = 0x8000
+STACK_BASE = 256
+STATIC_BASE = 16
+
+SEGMENT_POINTERS = {'local': 1, 'argument': 2, 'this': 3, 'that': 4}  # RAM address of every segment's base
+FIXED_SEGMENTS = {'pointer': 3, 'temp': 5}  # RAM address of the segments at a fixed address
+
+# Opcodes of the compiled program, each is followed by its operands in the code array
+PUSH_CONSTANT = 0  # value
+PUSH_SEGMENT = 1  # segment pointer, index
+PUSH_FIXED = 2  # RAM address (pointer, temp and static)
+POP_SEGMENT = 3  # segment pointer, index
+POP_FIXED = 4  # RAM address
+ADD = 5
+SUB = 6
+NEG = 7
+EQ = 8
+GT = 9
+LT = 10
+AND = 11
+OR = 12
+NOT = 13
+GOTO = 14  # code offset
+IF_GOTO = 15  # code offset
+CALL = 16  # code offset of the function, number of arguments, return site
+FUNCTION = 17  # number of locals
+RETURN = 18
+HALT = 19  # a goto to itself (label END, goto END) or running past the end of the program
+# Superinstructions, the fused commands of a recurring sequence
+INCREMENT_SEGMENT = 20  # segment pointer, index, amount: push S i, push constant k, add/sub, pop S i
+INCREMENT_FIXED = 21  # RAM address, amount: the same for pointer, temp and static
+DEREFERENCE = 22  # pop pointer 1, push that 0 (after a push)
+ADD_DEREFERENCE = 23  # add, pop pointer 1, push that 0
+ARRAY_WRITE = 24  # pop temp 0, pop pointer 1, push temp 0, pop that 0
+NOT_IF_GOTO = 25  # code offset: not, if-goto
+
+ARITHMETIC = {'add': ADD, 'sub': SUB, 'neg': NEG, 'eq': EQ, 'gt': GT, 'lt': LT, 'and': AND, 'or': OR, 'not': NOT}
+OPERANDS = {PUSH_CONSTANT: 1, PUSH_SEGMENT: 2, PUSH_FIXED: 1, POP_SEGMENT: 2, POP_FIXED: 1, GOTO: 1, IF_GOTO: 1,
+            CALL: 3, FUNCTION: 1, INCREMENT_SEGMENT: 3, INCREMENT_FIXED: 2, NOT_IF_GOTO: 1}
+POP_POINTER_THAT = ['pop', 'pointer', '1']
+PUSH_THAT = ['push', 'that', '0']
+ARRAY_WRITE_COMMANDS = [['pop', 'temp', '0'], POP_POINTER_THAT, ['push', 'temp', '0'], ['pop', 'that', '0']]
+
+
+def read_lines(vm_file):
+    """Yields the lines of vm_file that hold a command, without their comments and surrounding whitespace"""
+    with open(vm_file, 'r') as file:
+        for line in file:
+            cleaned_line = line.split('//')[0].strip()
+            if cleaned_line:
+                yield cleaned_line
+
+
+def read_program(path):
+    """Returns the (file name, lines) sources of a .vm file or of the .vm files of a directory, in the order the
+    translator translates them"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, file) for file in os.listdir(path) if file.endswith('.vm'))
+    elif os.path.isfile(path) and path.endswith('.vm'):
+        files = [path]
+    else:
+        raise ValueError(f'Expected <path/to/dir | file.vm>; Gotten {path}')
+    return [(os.path.basename(file), list(read_lines(file))) for file in files]
+
+
+def wrap(value):
+    """Returns the signed 16-bit word of an int that overflowed it"""
+    return ((value + SIGN_BIT) & WORD_MASK) - SIGN_BIT
+
+
+class Loader:
+    """Compiles VM commands into the flat code array VM runs. Labels and functions are resolved to code offsets
+    once every command was compiled, and the static variables get the RAM addresses the assembler would give them
+    (from 16 on, by their first appearance).
+    With fuse, the sequences the translator's --fuse recognizes are compiled into one superinstruction each"""
+    def __init__(self, fuse=True):
+        self.fuse = fuse
+        self.fusion_sites = {}  # pattern -> number of times it was fused
+        self.fusion_saving = {}  # pattern -> commands its sites save dispatching, every time they all run
+        self.code = array('l')
+        self.functions = {}  # function name -> code offset
+        self.labels = {}  # function$label -> code offset
+        self.fixups = []  # (code position, table, name, source) of every jump target to resolve
+        self.statics = {}  # File.index -> RAM address
+        self.return_sites = array('l')  # code offset every call returns to, by its return site
+        self.function_name = ''
+        self.file_name = ''
+
+    def load(self, sources, bootstrap):
+        """Compiles (file name, lines) sources. The bootstrap sets SP to 256 and calls Sys.init"""
+        if bootstrap:
+            self.emit_call('Sys.init', 0, 'bootstrap')
+        for file_name, lines in sources:
+            self.file_name = file_name
+            commands = [line.split() for line in lines]
+            index = 0
+            while index < len(commands):
+                try:
+                    length = self.compile_fused(commands, index) if self.fuse else 0
+                    if not length:
+                        self.compile(commands[index])
+                        length = 1
+                except (ValueError, IndexError) as e:
+                    raise ValueError(f'{file_name}: {" ".join(commands[index])}: {e}') from None
+                index += length
+        self.code.append(HALT)
+        for position, table, name, source in self.fixups:
+            if name not in table:
+                raise ValueError(f'{source}: unknown {"function" if table is self.functions else "label"} {name}')
+            self.code[position] = table[name]
+        self.mark_halts()
+        return self.code
+
+    def compile(self, args):
+        opcode, code = args[0], self.code
+        if opcode in ARITHMETIC and len(args) == 1:
+            code.append(ARITHMETIC[opcode])
+        elif opcode in ('push', 'pop') and len(args) == 3:
+            self.compile_push_pop(opcode, args[1], int(args[2]))
+        elif opcode == 'label' and len(args) == 2:
+            self.labels[f'{self.function_name}${args[1]}'] = len(code)
+        elif opcode in ('goto', 'if-goto') and len(args) == 2:
+            code.extend((GOTO if opcode == 'goto' else IF_GOTO, 0))
+            self.fixups.append((len(code) - 1, self.labels, f'{self.function_name}${args[1]}', self.file_name))
+        elif opcode == 'function' and len(args) == 3:
+            self.function_name = args[1]
+            self.functions[args[1]] = len(code)
+            code.extend((FUNCTION, int(args[2])))
+        elif opcode == 'call' and len(args) == 3:
+            self.emit_call(args[1], int(args[2]), self.file_name)
+        elif opcode == 'return' and len(args) == 1:
+            code.append(RETURN)
+        else:
+            raise ValueError('unknown command')
+
+    def compile_push_pop(self, opcode, segment, index):
+        code = self.code
+        if segment == 'constant':
+            if opcode == 'pop':
+                raise ValueError('can\'t pop to constant')
+            if not 0 <= index <= ADDRESS_MASK:
+                raise ValueError('constant out of range')
+            code.extend((PUSH_CONSTANT, index))
+        elif segment in SEGMENT_POINTERS:
+            code.extend((PUSH_SEGMENT if opcode == 'push' else POP_SEGMENT, SEGMENT_POINTERS[segment], index))
+        elif segment in FIXED_SEGMENTS or segment == 'static':
+            code.extend((PUSH_FIXED if opcode == 'push' else POP_FIXED, self.fixed_address(segment, index)))
+        else:
+            raise ValueError('unknown segment')
+
+    def fixed_address(self, segment, index):
+        """Returns the RAM address of a word of pointer, temp or static"""
+        if segment == 'static':
+            return self.statics.setdefault(f'{self.file_name[:-3]}.{index}', STATIC_BASE + len(self.statics))
+        return FIXED_SEGMENTS[segment] + index
+
+    def compile_fused(self, commands, index):
+        """Compiles the superinstruction of the sequence at index. Returns the number of commands it fused, 0 if
+        no pattern starts at index"""
+        window = commands[index:index + 4]
+        first, code = window[0], self.code
+        if (len(window) == 4 and first[0] == 'push' and len(first) == 3 and window[1][:2] == ['push', 'constant']
+                and window[2] in (['add'], ['sub']) and window[3] == ['pop'] + first[1:]
+                and (first[1] in SEGMENT_POINTERS or first[1] in FIXED_SEGMENTS or first[1] == 'static')):
+            amount = int(window[1][2]) if window[2] == ['add'] else -int(window[1][2])
+            if first[1] in SEGMENT_POINTERS:
+                code.extend((INCREMENT_SEGMENT, SEGMENT_POINTERS[first[1]], int(first[2]), amount))
+            else:
+                code.extend((INCREMENT_FIXED, self.fixed_address(first[1], int(first[2])), amount))
+            return self.record_fusion('increment', 4, 1)
+        if window[1:3] == [POP_POINTER_THAT, PUSH_THAT] and first == ['add']:
+            code.append(ADD_DEREFERENCE)
+            return self.record_fusion('array_read', 3, 1)
+        if window[1:3] == [POP_POINTER_THAT, PUSH_THAT] and first[0] == 'push':
+            self.compile(first)
+            code.append(DEREFERENCE)
+            return self.record_fusion('array_read', 3, 2)
+        if window == ARRAY_WRITE_COMMANDS:
+            code.append(ARRAY_WRITE)
+            return self.record_fusion('array_write', 4, 1)
+        if first == ['not'] and len(window) > 1 and window[1][0] == 'if-goto' and len(window[1]) == 2:
+            code.extend((NOT_IF_GOTO, 0))
+            self.fixups.append((len(code) - 1, self.labels, f'{self.function_name}${window[1][1]}', self.file_name))
+            return self.record_fusion('not_if_goto', 2, 1)
+        return 0
+
+    def record_fusion(self, pattern, commands, operations):
+        """Counts a site of pattern, which fused commands into operations. Returns the number of commands"""
+        self.fusion_sites[pattern] = self.fusion_sites.get(pattern, 0) + 1
+        self.fusion_saving[pattern] = self.fusion_saving.get(pattern, 0) + commands - operations
+        return commands
+
+    def emit_call(self, function, args_count, source):
+        if len(self.return_sites) > WORD_MASK:
+            raise ValueError(f'more than {WORD_MASK + 1} calls, their return sites don\'t fit a word')
+        code = self.code
+        code.extend((CALL, 0, args_count, len(self.return_sites)))
+        self.fixups.append((len(code) - 3, self.functions, function, source))
+        self.return_sites.append(len(code))
+
+    def mark_halts(self):
+        """Replaces every goto to itself with a HALT, the padding of its operand is never read"""
+        code, offset = self.code, 0
+        while offset < len(code):
+            opcode = code[offset]
+            if opcode == GOTO and code[offset + 1] == offset:
+                code[offset] = HALT
+            offset += 1 + OPERANDS.get(opcode, 0)
+
+
+class VM:
+    """Executes a VM program without translating it to Hack. The commands are compiled once into an array of
+    opcodes and their operands, and run over the RAM the translated program would run over: SP, LCL, ARG, THIS and
+    THAT at 0-4, temp at 5-12, the statics from 16 and the stack from 256. Calls and returns build and unwind the
+    frames of translate_call and translate_return, with a return site number where the translation saves a ROM
+    address.
+    Values are signed 16-bit words, gt and lt compare them as signed words like every translation mode does.
+    With fuse, recurring sequences run as superinstructions, each counts as a single command"""
+    def __init__(self, sources, bootstrap=None, fuse=True):
+        if bootstrap is None:
+            bootstrap = len(sources) > 1
+        loader = Loader(fuse)
+        self.code = loader.load(sources, bootstrap)
+        self.return_sites = loader.return_sites
+        self.statics = loader.statics
+        self.fusion_sites = loader.fusion_sites
+        self.fusion_saving = loader.fusion_saving
+        self.ram = array('h', bytes(2 * RAM_SIZE))
+        if bootstrap:
+            self.ram[0] = STACK_BASE
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+
+    @classmethod
+    def load(cls, path, bootstrap=None, fuse=True):
+        """Creates a VM running a .vm file or a directory of them. A directory of more than one file is
+        bootstrapped, as the translator would"""
+        return cls(read_program(path), bootstrap, fuse)
+
+    def reset(self):
+        """Restarts the program, RAM is kept as is"""
+        self.pc = self.cycles = 0
+        self.halted = False
+
+    def run(self, max_commands=None):
+        """Runs until the program halts or max_commands were executed. Returns the number executed"""
+        code, ram, return_sites = self.code, self.ram, self.return_sites
+        pc = self.pc
+        sp = ram[0]  # kept in a local, RAM[0] is read and written through it when a segment reaches it
+        remaining = -1 if max_commands is None else max_commands
+        while remaining:
+            remaining -= 1
+            opcode = code[pc]
+            if opcode == PUSH_CONSTANT:
+                ram[sp] = code[pc + 1]
+                sp += 1
+                pc += 2
+            elif opcode == PUSH_SEGMENT:
+                address = (ram[code[pc + 1]] + code[pc + 2]) & ADDRESS_MASK
+                ram[sp] = ram[address] if address else sp
+                sp += 1
+                pc += 3
+            elif opcode == POP_SEGMENT:
+                address = (ram[code[pc + 1]] + code[pc + 2]) & ADDRESS_MASK
+                sp -= 1
+                if address:
+                    ram[address] = ram[sp]
+                else:
+                    sp = ram[sp]
+                pc += 3
+            elif opcode == PUSH_FIXED:
+                ram[sp] = ram[code[pc + 1]]
+                sp += 1
+                pc += 2
+            elif opcode == POP_FIXED:
+                sp -= 1
+                ram[code[pc + 1]] = ram[sp]
+                pc += 2
+            elif opcode == ADD:
+                sp -= 1
+                value = ram[sp - 1] + ram[sp]
+                ram[sp - 1] = value if -SIGN_BIT <= value < SIGN_BIT else wrap(value)
+                pc += 1
+            elif opcode == SUB:
+                sp -= 1
+                value = ram[sp - 1] - ram[sp]
+                ram[sp - 1] = value if -SIGN_BIT <= value < SIGN_BIT else wrap(value)
+                pc += 1
+            elif opcode == ADD_DEREFERENCE:
+                # THAT = x + y, which the word at THAT replaces. Reaching SP reads it as the unfused commands do
+                sp -= 1
+                value = ram[sp - 1] + ram[sp]
+                ram[4] = value = value if -SIGN_BIT <= value < SIGN_BIT else wrap(value)
+                address = value & ADDRESS_MASK
+                ram[sp - 1] = ram[address] if address else sp - 1
+                pc += 1
+            elif opcode == INCREMENT_SEGMENT:
+                address = (ram[code[pc + 1]] + code[pc + 2]) & ADDRESS_MASK
+                if address:
+                    value = ram[address] + code[pc + 3]
+                    ram[address] = value if -SIGN_BIT <= value < SIGN_BIT else wrap(value)
+                else:
+                    sp = wrap(sp + code[pc + 3])
+                pc += 4
+            elif opcode == INCREMENT_FIXED:
+                address = code[pc + 1]
+                value = ram[address] + code[pc + 2]
+                ram[address] = value if -SIGN_BIT <= value < SIGN_BIT else wrap(value)
+                pc += 3
+            elif opcode == IF_GOTO:
+                sp -= 1
+                pc = code[pc + 1] if ram[sp] else pc + 2
+            elif opcode == NOT_IF_GOTO:
+                sp -= 1
+                pc = code[pc + 1] if ram[sp] != -1 else pc + 2
+            elif opcode == DEREFERENCE:
+                value = ram[4] = ram[sp - 1]
+                address = value & ADDRESS_MASK
+                ram[sp - 1] = ram[address] if address else sp - 1
+                pc += 1
+            elif opcode == ARRAY_WRITE:
+                # temp 0 = the value, THAT = the address under it
+                sp -= 2
+                value = ram[5] = ram[sp + 1]
+                ram[4] = ram[sp]
+                address = ram[sp] & ADDRESS_MASK
+                if address:
+                    ram[address] = value
+                else:
+                    sp = value
+                pc += 1
+            elif opcode == GOTO:
+                pc = code[pc + 1]
+            elif opcode == NOT:
+                ram[sp - 1] = ~ram[sp - 1]
+                pc += 1
+            elif opcode == EQ:
+                sp -= 1
+                ram[sp - 1] = -(ram[sp - 1] == ram[sp])
+                pc += 1
+            elif opcode == GT:
+                sp -= 1
+                ram[sp - 1] = -(ram[sp - 1] > ram[sp])
+                pc += 1
+            elif opcode == LT:
+                sp -= 1
+                ram[sp - 1] = -(ram[sp - 1] < ram[sp])
+                pc += 1
+            elif opcode == AND:
+                sp -= 1
+                ram[sp - 1] &= ram[sp]
+                pc += 1
+            elif opcode == OR:
+                sp -= 1
+                ram[sp - 1] |= ram[sp]
+                pc += 1
+            elif opcode == NEG:
+                ram[sp - 1] = wrap(-ram[sp - 1])
+                pc += 1
+            elif opcode == CALL:
+                # push the return site, LCL, ARG, THIS and THAT, ARG = SP - 5 - arguments, LCL = SP
+                ram[sp] = wrap(code[pc + 3])
+                ram[sp + 1:sp + 5] = ram[1:5]
+                sp += 5
+                ram[2] = sp - 5 - code[pc + 2]
+                ram[1] = sp
+                pc = code[pc + 1]
+            elif opcode == FUNCTION:
+                locals_count = code[pc + 1]
+                ram[sp:sp + locals_count] = array('h', bytes(2 * locals_count))
+                sp += locals_count
+                pc += 2
+            elif opcode == RETURN:
+                # the return value replaces the arguments, then the caller's frame is restored
+                frame = ram[1]
+                return_site = ram[frame - 5] & WORD_MASK
+                ram[ram[2]] = ram[sp - 1]
+                sp = ram[2] + 1
+                ram[1:5] = ram[frame - 4:frame]
+                pc = return_sites[return_site]
+            else:  # HALT
+                self.halted = True
+                remaining += 1
+                break
+        if max_commands is None:
+            executed = -1 - remaining
+        else:
+            executed = max_commands - remaining
+        ram[0] = sp
+        self.pc = pc
+        self.cycles += executed
+        return executed
+
+    def peek(self, address):
+        """Returns the signed value of RAM[address]"""
+        return self.ram[address]
+
+    def poke(self, address, value):
+        """Sets RAM[address] to value, values out of the signed 16-bit range wrap around it"""
+        self.ram[address] = wrap(value)
+
+    def dump(self, start, end):
+        """Returns (address, signed value) for every RAM address in [start, end)"""
+        return [(address, self.ram[address]) for address in range(start, end)]
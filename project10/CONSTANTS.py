@@ -16,3 +16,13 @@ STRINGS_REGEX = r'"[^"\n]*"'
 IDENTIFIERS_REGEX = r'[\w]+'
 WORD = re.compile(
     f'{KEYWORD_REGEX}|{SYMBOLS_REGEX}|{INTEGER_REGEX}|{STRINGS_REGEX}|{IDENTIFIERS_REGEX}')
+# every token in one pass, the name of the matching group is the token type (keywords are found as identifiers)
+TOKEN_REGEX = re.compile(
+    f'(?P<symbol>{SYMBOLS_REGEX})|(?P<integerConstant>{INTEGER_REGEX})'
+    f'|(?P<stringConstant>{STRINGS_REGEX})|(?P<identifier>{IDENTIFIERS_REGEX})')
+# strings are matched first so comment markers inside them are kept
+COMMENTS_REGEX = re.compile(rf'{STRINGS_REGEX}|//[^\n]*|/\*.*?(?:\*/|\Z)', re.DOTALL)
+
+# XML OUTPUT:
+INDENT = '  '
+FLUSH_THRESHOLD = 64 * 1024  # characters buffered before they are written to the xml file
@@ -1,21 +1,37 @@
 from JackTokenizer import JackTokenizer
-from CONSTANTS import UNARY_OPERATORS, BINARY_OPERATORS, KEYWORD_CONSTANTS
+from CONSTANTS import UNARY_OPERATORS, BINARY_OPERATORS, KEYWORD_CONSTANTS, INDENT, FLUSH_THRESHOLD
 
 class CompilationEngine:
-    def __init__(self, in_file, out_file):
+    def __init__(self, in_file, out_file, flush_threshold=FLUSH_THRESHOLD):
         self.tokenizer = JackTokenizer(in_file)
         self.rules = []
         self.output_file = out_file
+        self.output = open(out_file, 'a')
+        self.buffer = []
+        self.buffer_size = 0
+        self.flush_threshold = flush_threshold
+        self.depth = 0
+        self.indents = ['']
         self.indent = ''
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def inc_indent(self):
         """ increases indent by two spaces"""
-        self.indent += '  '
+        self.depth += 1
+        if self.depth == len(self.indents):
+            self.indents.append(INDENT * self.depth)
+        self.indent = self.indents[self.depth]
 
     def dec_indent(self):
         """ decreases indent by two spaces if possible"""
-        if len(self.indent) > 1:
-            self.indent = self.indent[:-2]
+        if self.depth > 0:
+            self.depth -= 1
+        self.indent = self.indents[self.depth]
 
     def advance(self):
         """ gets and writes the next token"""
@@ -23,10 +39,29 @@ class CompilationEngine:
         self.write_terminal(token, value)
 
     # WRITES TO FILE:
+    def write(self, line):
+        """ buffers a line and writes the buffer to the file once it passes the flush threshold"""
+        self.buffer.append(line)
+        self.buffer_size += len(line)
+        if self.buffer_size >= self.flush_threshold:
+            self.flush()
+
+    def flush(self):
+        """ writes the buffered lines to the output file"""
+        if self.buffer:
+            self.output.write(''.join(self.buffer))
+            self.buffer = []
+            self.buffer_size = 0
+
+    def close(self):
+        """ flushes the remaining lines and closes the output file"""
+        if not self.output.closed:
+            self.flush()
+            self.output.close()
+
     def write_non_terminal_start(self, rule):
         """ wirtes <rule> and adds it to rules"""
-        with open(self.output_file, 'a') as outFile:
-            outFile.write(f'{self.indent}<{rule}>\n')
+        self.write(f'{self.indent}<{rule}>\n')
         self.rules.append(rule)
         self.inc_indent()
 
@@ -34,13 +69,11 @@ class CompilationEngine:
         """ writes </rule> using the last rule in the list that hasn't been closed"""
         self.dec_indent()
         rule = self.rules.pop()
-        with open(self.output_file, 'a') as outFile:
-            outFile.write(f'{self.indent}</{rule}>\n')
+        self.write(f'{self.indent}</{rule}>\n')
 
     def write_terminal(self, token, value):
         """ writes <token> value </token>"""
-        with open(self.output_file, 'a') as outFile:
-            outFile.write(f'{self.indent}<{token}> {value} </{token}>\n')
+        self.write(f'{self.indent}<{token}> {value} </{token}>\n')
 
     # VALUE/TOKEN CHECKS:
     def is_next_val_in_list(self, lst):
@@ -104,6 +137,7 @@ class CompilationEngine:
             self.compile_subroutine()
         self.advance()  # '}'
         self.write_non_terminal_end()
+        self.close()
 
     def compile_subroutine(self):
         """ compiles a method/function/constructor"""
@@ -1,41 +1,69 @@
-import sys, os
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from CompilationEngine import CompilationEngine
 
 
+def compile_file(file_path):
+    """Compiles a single .jack file into a .xml file next to it. Returns an error message, or None on success"""
+    output = file_path[:-4] + "xml"
+    if os.path.exists(output):
+        os.remove(output)
+    compiler = None
+    try:
+        compiler = CompilationEngine(file_path, output)
+        compiler.compile_class()
+    except Exception as e:
+        if compiler is None:
+            return f"{file_path}: {type(e).__name__}: {e}"
+        compiler.close()
+        os.remove(output)  # the partial XML flushed by close
+        line = compiler.tokenizer.line_number()
+        return f"{file_path}:{line}: {type(e).__name__}: {e}"
+    return None
+
+
+def compile_files(files, jobs=1):
+    """Compiles every file, across a process pool when jobs > 1. Returns the errors in the order of files"""
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(compile_file, files))
+    else:
+        results = [compile_file(file) for file in files]
+    return [error for error in results if error is not None]
+
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: JackAnalyzer  <path/to/dir | file.jack>")
-        exit(1)
+    parser = argparse.ArgumentParser(prog="JackAnalyzer", usage="JackAnalyzer <path/to/dir | file.jack> [--jobs N]")
+    parser.add_argument("path")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of files compiled in parallel")
+    args = parser.parse_args()
 
-    user_input = sys.argv[1]
+    user_input = args.path
     # Single file:
     if os.path.isfile(user_input) and user_input.endswith('.jack'):
-        output = os.path.join(user_input[:-4] + "xml")
-        if os.path.exists(output):
-            os.remove(output)
-        compiler = CompilationEngine(user_input, output)
-        compiler.compile_class()
-        print("Done compiling")
-        exit(0)
+        files = [user_input]
 
     # Dir
-    if os.path.isdir(user_input):
+    elif os.path.isdir(user_input):
         path = user_input.rstrip('/').rstrip('\\')
-        for file in os.listdir(user_input):
-            if file.endswith('.jack'):
-                print(f"Processing {file}")
-                file_path = os.path.join(path, file)
-                output = os.path.join(path, file[:-4] + "xml")
-                if os.path.exists(output):
-                    os.remove(output)
-                compiler = CompilationEngine(file_path, output)
-                compiler.compile_class()
-        print("Done compiling")
-        exit(0)
+        files = [os.path.join(path, file) for file in sorted(os.listdir(user_input)) if file.endswith('.jack')]
+        for file in files:
+            print(f"Processing {os.path.basename(file)}")
 
     else:
         print("Expected <path/to/dir | file.jack>; Gotten " + user_input)
-        exit(2)
+        sys.exit(2)
+
+    errors = compile_files(files, args.jobs)
+    for error in errors:
+        print(f"ERROR: {error}")
+    if errors:
+        print(f"Failed compiling {len(errors)} of {len(files)} files")
+        sys.exit(3)
+    print("Done compiling")
+    sys.exit(0)
 
 
 if __name__ == "__main__":
@@ -2,52 +2,37 @@ from CONSTANTS import *
 
 
 class JackTokenizer:
-    def __init__(self, file):
+    def __init__(self, file, single_pass=True):
+        # single_pass classifies tokens by the TOKEN_REGEX group that matched them,
+        # otherwise every word found by WORD is matched again by token_type
+        self.single_pass = single_pass
         with open(file, 'r') as f:
             self.lines = f.read()
         self.clean_code()
         self.currToken = ''
+        self.position = 0  # index of the next token in tokens
         self.tokens = self.tokenize()
         self.tokens = self.replace_symbols() # list of tuples(token, value)
 
     def clean_code(self):
-        """ Removes comments from the file"""
-        index = 0
-        clean_text = ''
-        while index < len(self.lines):  # Iterate over the entire text and clean the code
-            current_char = self.lines[index]
-            # In String
-            if current_char == '\"':
-                end_index = self.lines.find('\"', index + 1)
-                clean_text += self.lines[index: end_index + 1]
-                index = end_index + 1
-            # Comment
-            elif current_char == '/':
-                # single line comment '//'
-                if self.lines[index + 1] == '/':
-                    end_index = self.lines.find('\n', index + 1)
-                    index = end_index + 1
-                    clean_text += ' '
-                # multi line comment
-                elif self.lines[index + 1] == '*':
-                    end_index = self.lines.find('*/', index + 1)
-                    index = end_index + 2
-                    clean_text += ' '
-                # / for divide
-                else:
-                    clean_text += self.lines[index]
-                    index = index + 1
-            else:
-                clean_text += self.lines[index]
-                index = index + 1
-
-        # sets lines to the cleaned version
-        self.lines = clean_text
-        return
+        """ Removes comments from the file in a single pass, keeping strings and line breaks in place"""
+        self.lines = COMMENTS_REGEX.sub(self.replace_comment, self.lines)
 
     def tokenize(self):
-        """ Tokenizes the text"""
-        return [self.token_type(word) for word in self.split_into_tokens(self.lines)]
+        """ Tokenizes the text and records the line each token starts on"""
+        tokens = []
+        self.token_lines = []
+        line, last_index = 1, 0
+        if self.single_pass:
+            scanner, classify = TOKEN_REGEX, self.token_type_of_match
+        else:
+            scanner, classify = WORD, self.token_type_of_word
+        for match in scanner.finditer(self.lines):
+            line += self.lines.count('\n', last_index, match.start())
+            last_index = match.start()
+            tokens.append(classify(match))
+            self.token_lines.append(line)
+        return tokens
 
     def replace_symbols(self):
         """
@@ -61,18 +46,26 @@ class JackTokenizer:
 
     def has_more_tokens(self):
         """ Checks if there are more tokens to process"""
-        return self.tokens != []
+        return self.position < len(self.tokens)
 
-    def peek(self):
-        """ Returns the first token in tokens"""
-        if self.has_more_tokens():
-            return self.tokens[0]
+    def peek(self, k=0):
+        """ Returns the token k places after the next one without advancing"""
+        index = self.position + k
+        if index < len(self.tokens):
+            return self.tokens[index]
         return 'ERROR', 'END OF FILE'
 
+    def line_number(self):
+        """ Returns the line of the last token returned by advance, 0 before the first one"""
+        if self.position == 0:
+            return 0
+        return self.token_lines[self.position - 1]
+
     def advance(self):
         """ Should only be called if hasMoreTokens() is true"""
         if self.has_more_tokens():
-            self.currToken = self.tokens.pop(0)
+            self.currToken = self.tokens[self.position]
+            self.position += 1
             return self.currToken
         return 'ERROR', 'END OF FILE'
 
@@ -89,6 +82,29 @@ class JackTokenizer:
         else:
             return "identifier", word
 
+    @staticmethod
+    def token_type_of_match(match):
+        """Classifies a TOKEN_REGEX match by the name of the group that matched, keywords are looked up in a set"""
+        token, word = match.lastgroup, match.group()
+        if token == 'identifier' and word in KEYWORDS:
+            return 'keyword', word
+        if token == 'stringConstant':
+            return token, word[1:-1]
+        return token, word
+
+    @staticmethod
+    def token_type_of_word(match):
+        """Classifies a WORD match with token_type"""
+        return JackTokenizer.token_type(match.group())
+
+    @staticmethod
+    def replace_comment(match):
+        """Replaces a comment with a space and the line breaks it spanned, strings are returned as is"""
+        text = match.group()
+        if text[0] == '"':
+            return text
+        return ' ' + '\n' * text.count('\n')
+
     @staticmethod
     def split_into_tokens(text):
         """Breaks a single string into a list of tokens"""
@@ -0,0 +1,178 @@
+class Node:
+    """A node of the syntax tree of a Jack class. Nodes keep their fields in slots, so a parsed class costs no
+    instance dicts, and compare by their fields"""
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{slot}={getattr(self, slot)!r}' for slot in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+# DECLARATIONS
+class Class(Node):
+    __slots__ = ('name', 'variables', 'subroutines')
+
+    def __init__(self, name: str, variables: list, subroutines: list):
+        self.name = name
+        self.variables = variables  # ClassVarDec nodes
+        self.subroutines = subroutines  # Subroutine nodes
+
+
+class ClassVarDec(Node):
+    __slots__ = ('kind', 'type', 'names')
+
+    def __init__(self, kind: str, type_: str, names: list):
+        self.kind = kind  # 'static' or 'field'
+        self.type = type_
+        self.names = names
+
+
+class Subroutine(Node):
+    __slots__ = ('kind', 'return_type', 'name', 'parameters', 'variables', 'statements', 'line')
+
+    def __init__(self, kind: str, return_type: str, name: str, parameters: list, variables: list, statements: list,
+                 line: int = 0):
+        self.kind = kind  # 'constructor', 'function' or 'method'
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters  # Parameter nodes
+        self.variables = variables  # VarDec nodes
+        self.statements = statements
+        self.line = line
+
+
+class Parameter(Node):
+    __slots__ = ('type', 'name')
+
+    def __init__(self, type_: str, name: str):
+        self.type = type_
+        self.name = name
+
+
+class VarDec(Node):
+    __slots__ = ('type', 'names')
+
+    def __init__(self, type_: str, names: list):
+        self.type = type_
+        self.names = names
+
+
+# STATEMENTS, every one knows the line its keyword is on
+class LetStatement(Node):
+    __slots__ = ('name', 'index', 'value', 'line')
+
+    def __init__(self, name: str, index, value, line: int = 0):
+        self.name = name
+        self.index = index  # the Expression of name[index] = value, None for name = value
+        self.value = value
+        self.line = line
+
+
+class IfStatement(Node):
+    __slots__ = ('condition', 'statements', 'else_statements', 'line')
+
+    def __init__(self, condition, statements: list, else_statements, line: int = 0):
+        self.condition = condition
+        self.statements = statements
+        self.else_statements = else_statements  # None without an else, which differs from an empty else
+        self.line = line
+
+
+class WhileStatement(Node):
+    __slots__ = ('condition', 'statements', 'line')
+
+    def __init__(self, condition, statements: list, line: int = 0):
+        self.condition = condition
+        self.statements = statements
+        self.line = line
+
+
+class DoStatement(Node):
+    __slots__ = ('call', 'line')
+
+    def __init__(self, call, line: int = 0):
+        self.call = call  # a SubroutineCall
+        self.line = line
+
+
+class ReturnStatement(Node):
+    __slots__ = ('value', 'line')
+
+    def __init__(self, value, line: int = 0):
+        self.value = value  # an Expression, None in void subroutines
+        self.line = line
+
+
+# EXPRESSIONS
+class Expression(Node):
+    """Jack has no operator precedence, an expression applies its operators from left to right:
+    terms[0] operators[0] terms[1] operators[1] terms[2] ..."""
+    __slots__ = ('terms', 'operators')
+
+    def __init__(self, terms: list, operators: list):
+        self.terms = terms
+        self.operators = operators
+
+
+class IntegerConstant(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value: int):
+        self.value = value
+
+
+class StringConstant(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        self.value = value
+
+
+class KeywordConstant(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        self.value = value  # 'true', 'false', 'null' or 'this'
+
+
+class VariableTerm(Node):
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class ArrayTerm(Node):
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name: str, index):
+        self.name = name
+        self.index = index
+
+
+class SubroutineCall(Node):
+    __slots__ = ('receiver', 'name', 'arguments')
+
+    def __init__(self, receiver, name: str, arguments: list):
+        self.receiver = receiver  # the variable or class before the '.', None for a method of this class
+        self.name = name
+        self.arguments = arguments  # Expression nodes
+
+
+class UnaryTerm(Node):
+    __slots__ = ('operator', 'term')
+
+    def __init__(self, operator: str, term):
+        self.operator = operator
+        self.term = term
+
+
+class ParenthesizedTerm(Node):
+    __slots__ = ('expression',)
+
+    def __init__(self, expression):
+        self.expression = expression
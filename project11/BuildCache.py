@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+
+
+class BuildCache:
+    """A manifest file recording, per build target, the hash of its sources and of the output they produced.
+    A target is fresh when neither its sources, its output nor the version that built it have changed"""
+    def __init__(self, manifest_file, version):
+        self.manifest_file = manifest_file
+        self.version = version
+        self.targets = self.load()
+
+    def load(self):
+        """Returns the recorded targets, or nothing if the manifest is missing, unreadable or of another version"""
+        try:
+            with open(self.manifest_file, 'r') as manifest:
+                content = json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(content, dict) or content.get('version') != self.version:
+            return {}
+        return content.get('targets', {})
+
+    def save(self):
+        with open(self.manifest_file, 'w') as manifest:
+            json.dump({'version': self.version, 'targets': self.targets}, manifest, indent=2, sort_keys=True)
+
+    def is_fresh(self, target, sources, output):
+        """Checks if output was built by this version from sources as they are now"""
+        entry = self.targets.get(target)
+        return (entry is not None
+                and entry['sources'] == self.hash_files(sources)
+                and entry['output'] == self.hash_files([output]))
+
+    def record(self, target, sources, output):
+        """Records the current hashes of sources and of the output built from them"""
+        self.targets[target] = {'sources': self.hash_files(sources), 'output': self.hash_files([output])}
+
+    def forget(self, target):
+        self.targets.pop(target, None)
+
+    @staticmethod
+    def hash_files(files):
+        """Returns a sha256 of the names and contents of files, None if one of them doesn't exist"""
+        digest = hashlib.sha256()
+        for file in files:
+            if not os.path.isfile(file):
+                return None
+            digest.update(os.path.basename(file).encode())
+            with open(file, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
@@ -0,0 +1,37 @@
+from VMWriter import VMWriter
+
+
+class CodeGenerator:
+    """Writes the functions built by IRBuilder as VM code. Every function is written whole, its function command
+    first, so the functions of a class can be generated in any order or apart"""
+    def __init__(self, writer: VMWriter):
+        self.writer = writer
+        self.labeled = {
+            'label': writer.write_label,
+            'goto': writer.write_goto,
+            'if-goto': writer.write_if_goto,
+        }
+
+    def generate(self, functions):
+        for function in functions:
+            self.generate_function(function)
+
+    def generate_function(self, function):
+        self.writer.write_function(function.name, function.locals_count)
+        for command in function.commands:
+            self.write(command)
+
+    def write(self, command):
+        opcode, segment, index = command
+        if opcode == 'push':
+            self.writer.write_push(segment, index)
+        elif opcode == 'pop':
+            self.writer.write_pop(segment, index)
+        elif opcode in self.labeled:
+            self.labeled[opcode](segment)
+        elif opcode == 'call':
+            self.writer.write_call(segment, index)
+        elif opcode == 'return':
+            self.writer.write_return()
+        else:
+            self.writer.write_arithmetic(opcode)
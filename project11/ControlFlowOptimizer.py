@@ -0,0 +1,208 @@
+from collections import Counter
+from IR import VMCommand, Function
+
+NOT = VMCommand('not')
+SUB = VMCommand('sub')
+PUSH_ZERO = VMCommand('push', 'constant', 0)
+JUMPS = ('goto', 'if-goto')
+IDENTITIES = ('add', 'sub', 'or')  # x op 0 = x
+COMPARISONS = ('eq', 'lt', 'gt')
+BINARY = ('add', 'sub', 'and', 'or', 'eq', 'lt', 'gt')
+UNARY = ('neg', 'not')
+
+
+class BasicBlock:
+    """A run of commands entered only at its start (its labels) and left only at its end"""
+    __slots__ = ('commands', 'successors')
+
+    def __init__(self):
+        self.commands = []
+        self.successors = []  # indexes of the blocks control may go to next
+
+
+class ControlFlowOptimizer:
+    """Simplifies the control flow of compiled functions, until none of these changes anything:
+    - branches: conditional branch idioms are rewritten into their minimal form. if-goto A, goto B, label A becomes
+      not, if-goto B, label A when the condition is a boolean. A constant condition becomes a goto or nothing,
+      not, not cancels out, eq, not, if-goto becomes sub, if-goto and x op 0 stays x
+    - unreachable: the basic blocks that can't be reached from the function's entry are removed, the code after a
+      return and the bodies of while (false) loops for example
+    - jumps: a goto to the label that follows it is removed
+    - labels: the labels no jump targets are removed
+    removed counts the commands every kind of change removed"""
+    def __init__(self):
+        self.removed = {'branches': 0, 'unreachable': 0, 'jumps': 0, 'labels': 0}
+        self.jumps_to = Counter()  # the number of jumps to every label of the function being rewritten
+
+    @property
+    def saved(self) -> int:
+        return sum(self.removed.values())
+
+    def optimize(self, function: Function):
+        """Replaces the commands of function with the simplified ones"""
+        commands = function.commands
+        while True:
+            size = len(commands)
+            for kind, optimization_pass in (('branches', self.rewrite_branches),
+                                            ('unreachable', self.remove_unreachable_blocks),
+                                            ('jumps', self.remove_jumps_to_next),
+                                            ('labels', self.remove_unused_labels)):
+                optimized = optimization_pass(commands)
+                self.removed[kind] += len(commands) - len(optimized)
+                commands = optimized
+            if len(commands) == size:
+                break
+        function.commands = commands
+
+    # BRANCHES
+    def rewrite_branches(self, commands: list) -> list:
+        self.jumps_to = Counter(command.segment for command in commands if command.opcode in JUMPS)
+        output = []
+        for command in commands:
+            self.append(output, command)
+        return self.rewrite_negated_equalities(output)
+
+    def append(self, output: list, command: VMCommand):
+        """Appends command to output and rewrites the idiom it completes, if any"""
+        output.append(command)
+        opcode = command.opcode
+        if opcode == 'not' and len(output) > 1 and output[-2] == NOT:
+            del output[-2:]
+        elif opcode in IDENTITIES and len(output) > 1 and output[-2] == PUSH_ZERO:
+            del output[-2:]
+        elif opcode == 'if-goto':
+            self.rewrite_constant_condition(output)
+        elif opcode == 'label' and len(output) > 2:
+            if_goto, goto = output[-3:-1]
+            # not flips a boolean only, if-goto jumps on any other value that isn't 0 too
+            if (if_goto == ('if-goto', command.segment, None) and goto.opcode == 'goto'
+                    and self.is_boolean(output, len(output) - 3)):
+                del output[-3:]
+                self.append(output, NOT)
+                self.append(output, VMCommand('if-goto', goto.segment))
+                if self.jumps_to[command.segment] > 1:  # the if-goto removed was the only jump to it otherwise
+                    output.append(command)
+
+    @staticmethod
+    def rewrite_constant_condition(output: list):
+        """Turns the if-goto at the end of output into a goto or removes it if its condition is constant, c or not c
+        (-1 is pushed as not 0)"""
+        if_goto = output[-1]
+        if len(output) > 1 and output[-2].opcode == 'push' and output[-2].segment == 'constant':
+            taken = output[-2].index != 0
+            del output[-2:]
+        elif (len(output) > 2 and output[-2] == NOT and output[-3].opcode == 'push'
+              and output[-3].segment == 'constant'):
+            taken = ~output[-3].index != 0
+            del output[-3:]
+        else:
+            return
+        if taken:
+            output.append(VMCommand('goto', if_goto.segment))
+
+    def rewrite_negated_equalities(self, commands: list) -> list:
+        """eq, not, if-goto L -> sub, if-goto L: x - y isn't 0 exactly when x and y differ. It runs after the other
+        rewrites, as the difference isn't a boolean that not could flip"""
+        output = []
+        for command in commands:
+            output.append(command)
+            if command.opcode == 'if-goto' and len(output) > 2 and output[-2] == NOT and output[-3].opcode == 'eq':
+                del output[-3:]
+                self.append(output, SUB)
+                output.append(command)
+        return output
+
+    @staticmethod
+    def operand_start(commands: list, end: int):
+        """Returns the index the commands that push the value on top of the stack at end start from, None if they
+        aren't all in the same basic block before end"""
+        needed = 1
+        index = end
+        while needed or (index and commands[index - 1].opcode == 'pop'):  # a pop consumes what the operand pushed
+            index -= 1
+            if index < 0:
+                return None
+            command = commands[index]
+            opcode = command.opcode
+            if opcode == 'push':
+                needed -= 1
+            elif opcode == 'pop':
+                needed += 1
+            elif opcode in BINARY:
+                needed += 1
+            elif opcode == 'call':
+                needed += command.index - 1
+            elif opcode not in UNARY:
+                return None
+        return index
+
+    def is_boolean(self, commands: list, end: int) -> bool:
+        """Whether the value on top of the stack at end is true (-1) or false (0) whatever the variables are"""
+        if end == 0:
+            return False
+        last = commands[end - 1]
+        if last.opcode in COMPARISONS or last == PUSH_ZERO:
+            return True
+        if last.opcode == 'not':
+            return self.is_boolean(commands, end - 1)
+        if last.opcode in ('and', 'or'):
+            right = self.operand_start(commands, end - 1)
+            return right is not None and self.is_boolean(commands, end - 1) and self.is_boolean(commands, right)
+        return False
+
+    # UNREACHABLE BLOCKS
+    @staticmethod
+    def basic_blocks(commands: list) -> list:
+        """Splits commands into basic blocks: a block starts at a label, or after a jump or a return"""
+        blocks = [BasicBlock()]
+        for command in commands:
+            block = blocks[-1]
+            if command.opcode == 'label' and block.commands and block.commands[-1].opcode != 'label':
+                block = BasicBlock()
+                blocks.append(block)
+            block.commands.append(command)
+            if command.opcode in JUMPS or command.opcode == 'return':
+                blocks.append(BasicBlock())
+        entries = {command.segment: index for index, block in enumerate(blocks)
+                   for command in block.commands if command.opcode == 'label'}
+        for index, block in enumerate(blocks):
+            last = block.commands[-1] if block.commands else None
+            if last is not None and last.opcode in JUMPS:
+                block.successors.append(entries[last.segment])
+            if (last is None or last.opcode not in ('goto', 'return')) and index + 1 < len(blocks):
+                block.successors.append(index + 1)
+        return blocks
+
+    def remove_unreachable_blocks(self, commands: list) -> list:
+        blocks = self.basic_blocks(commands)
+        reached = {0}
+        pending = [0]
+        while pending:
+            for successor in blocks[pending.pop()].successors:
+                if successor not in reached:
+                    reached.add(successor)
+                    pending.append(successor)
+        return [command for index, block in enumerate(blocks) if index in reached for command in block.commands]
+
+    # JUMPS AND LABELS
+    @staticmethod
+    def remove_jumps_to_next(commands: list) -> list:
+        """Removes every goto followed by its label, possibly among other labels"""
+        output = []
+        for index, command in enumerate(commands):
+            if command.opcode == 'goto':
+                following = index + 1
+                while following < len(commands) and commands[following].opcode == 'label':
+                    if commands[following].segment == command.segment:
+                        break
+                    following += 1
+                else:
+                    output.append(command)
+                continue
+            output.append(command)
+        return output
+
+    @staticmethod
+    def remove_unused_labels(commands: list) -> list:
+        targets = {command.segment for command in commands if command.opcode in JUMPS}
+        return [command for command in commands if command.opcode != 'label' or command.segment in targets]
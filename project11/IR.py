@@ -0,0 +1,31 @@
+from typing import NamedTuple
+
+
+class VMCommand(NamedTuple):
+    """A VM command of the IR, shaped like the translator's: segment is the memory segment of push and pop, the
+    label of label, goto and if-goto and the function name of call. index is the segment index or the number of
+    arguments of a call. Commands are tuples, so they are equal and hash alike when their parts are"""
+    opcode: str
+    segment: str = None
+    index: int = None
+
+    def __str__(self) -> str:
+        return ' '.join(str(arg) for arg in (self.opcode, self.segment, self.index) if arg is not None)
+
+
+class Function:
+    """A compiled subroutine: the linear list of its body's commands, after which the number of its locals is known.
+    The function command itself isn't in commands, code generation writes it from name and locals_count"""
+    __slots__ = ('name', 'locals_count', 'commands')
+
+    def __init__(self, name: str, locals_count: int = 0, commands: list = None):
+        self.name = name
+        self.locals_count = locals_count
+        self.commands = [] if commands is None else commands
+
+    def __len__(self):
+        """The number of VM commands of the function, its function command included"""
+        return len(self.commands) + 1
+
+    def __repr__(self):
+        return f'Function({self.name!r}, {self.locals_count}, {len(self.commands)} commands)'
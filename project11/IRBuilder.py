@@ -0,0 +1,356 @@
+from AST import *
+from CONSTANTS import ARITHMETIC_OPERATORS, GLOBAL
+from IR import VMCommand, Function
+from SymbolTable import SymbolTable
+
+WORD_MASK = 0xFFFF
+SIGN_BIT = 0x8000
+MAX_CONSTANT = 0x7FFF  # largest value of push constant
+
+
+def wrap(value):
+    """Returns the signed 16-bit word of an int, as the Hack ALU would compute it"""
+    return ((value + SIGN_BIT) & WORD_MASK) - SIGN_BIT
+
+
+def fold(operator, x, y):
+    """Returns the value of x operator y for constant operands, or None for a division by zero (Math.divide
+    reports it at run time). Division truncates toward zero like Math.divide, comparisons give true (-1) or false"""
+    if operator == '+':
+        return wrap(x + y)
+    if operator == '-':
+        return wrap(x - y)
+    if operator == '*':
+        return wrap(x * y)
+    if operator == '/':
+        if y == 0:
+            return None
+        quotient = abs(x) // abs(y)
+        return wrap(-quotient if (x < 0) != (y < 0) else quotient)
+    if operator == '&':
+        return x & y
+    if operator == '|':
+        return x | y
+    if operator == '=':
+        return -(x == y)
+    if operator == '<':
+        return -(x < y)
+    return -(x > y)
+
+
+class IRBuilder:
+    """Lowers the syntax tree of a class into its functions, linear lists of VM commands, resolving the names with
+    the symbol table. With optimize, constant subexpressions are folded and multiplications by powers of two are
+    strength-reduced on the way"""
+    def __init__(self, optimize=False):
+        self.optimize = optimize
+        self.symbol_table = SymbolTable()
+        self.class_name = ''
+        self.commands = []  # the commands of the function being built
+        self.line = 0  # the line of the subroutine or statement being built, for errors
+        self.statement_builders = {
+            LetStatement: self.build_let,
+            IfStatement: self.build_if,
+            WhileStatement: self.build_while,
+            DoStatement: self.build_do,
+            ReturnStatement: self.build_return,
+        }
+        self.term_builders = {
+            IntegerConstant: self.build_integer,
+            StringConstant: self.build_string,
+            KeywordConstant: self.build_keyword,
+            VariableTerm: self.build_variable,
+            ArrayTerm: self.build_array_read,
+            SubroutineCall: self.build_call,
+            UnaryTerm: self.build_unary,
+            ParenthesizedTerm: self.build_parenthesized,
+        }
+
+    def emit(self, opcode, segment=None, index=None):
+        self.commands.append(VMCommand(opcode, segment, index))
+
+    # DECLARATIONS
+    def build_class(self, class_: Class) -> list:
+        """Returns the functions of a class, in the order of its subroutines"""
+        self.class_name = class_.name
+        for declaration in class_.variables:
+            for name in declaration.names:
+                self.symbol_table.define(name, declaration.type, declaration.kind)
+        return [self.build_subroutine(subroutine) for subroutine in class_.subroutines]
+
+    def build_subroutine(self, subroutine: Subroutine) -> Function:
+        name = f'{self.class_name}.{subroutine.name}'
+        self.line = subroutine.line
+        self.symbol_table.reset(name)
+        self.symbol_table.set_scope(name)
+        if subroutine.kind == 'method':
+            self.symbol_table.define('this', 'self', 'arg')
+        for parameter in subroutine.parameters:
+            self.symbol_table.define(parameter.name, parameter.type, 'arg')
+        for declaration in subroutine.variables:
+            for var_name in declaration.names:
+                self.symbol_table.define(var_name, declaration.type, 'var')
+        self.commands = []
+        self.load_pointer(subroutine.kind)
+        self.build_statements(subroutine.statements)
+        function = Function(name, self.symbol_table.count_variables('var'), self.commands)
+        self.symbol_table.set_scope(GLOBAL)
+        return function
+
+    def load_pointer(self, kind):
+        if kind == 'constructor':
+            self.emit('push', 'constant', self.symbol_table.count_variables_globally('field'))
+            self.emit('call', 'Memory.alloc', 1)
+            self.emit('pop', 'pointer', 0)
+        elif kind == 'method':
+            self.emit('push', 'argument', 0)
+            self.emit('pop', 'pointer', 0)
+
+    # STATEMENTS
+    def build_statements(self, statements):
+        for statement in statements:
+            self.line = statement.line
+            self.statement_builders[type(statement)](statement)
+
+    def build_let(self, statement: LetStatement):
+        if statement.index is not None:
+            self.build_array_address(statement.name, statement.index)
+        self.build_expression(statement.value)
+        if statement.index is not None:
+            self.emit('pop', 'temp', 0)
+            self.emit('pop', 'pointer', 1)
+            self.emit('push', 'temp', 0)
+            self.emit('pop', 'that', 0)
+        else:
+            self.pop_variable(statement.name)
+
+    def build_if(self, statement: IfStatement):
+        self.build_expression(statement.condition)
+        if_index = self.symbol_table.if_counter
+        self.symbol_table.if_counter += 1
+        self.emit('if-goto', f'IF{if_index}')
+        self.emit('goto', f'IF_FALSE{if_index}')
+        self.emit('label', f'IF{if_index}')
+        self.build_statements(statement.statements)
+        if statement.else_statements is not None:
+            self.emit('goto', f'IF_END{if_index}')
+            self.emit('label', f'IF_FALSE{if_index}')
+            self.build_statements(statement.else_statements)
+            self.emit('label', f'IF_END{if_index}')
+        else:
+            self.emit('label', f'IF_FALSE{if_index}')
+
+    def build_while(self, statement: WhileStatement):
+        while_index = self.symbol_table.while_counter
+        self.symbol_table.while_counter += 1
+        self.emit('label', f'WHILE{while_index}')
+        self.build_expression(statement.condition)
+        self.emit('not')
+        self.emit('if-goto', f'WHILE_END{while_index}')
+        self.build_statements(statement.statements)
+        self.emit('goto', f'WHILE{while_index}')
+        self.emit('label', f'WHILE_END{while_index}')
+
+    def build_do(self, statement: DoStatement):
+        self.build_call(statement.call)
+        self.emit('pop', 'temp', 0)
+
+    def build_return(self, statement: ReturnStatement):
+        if statement.value is None:
+            self.emit('push', 'constant', 0)
+        else:
+            self.build_expression(statement.value)
+        self.emit('return')
+
+    # EXPRESSIONS
+    def build_expression(self, expression: Expression):
+        value = self.fold_expression(expression)
+        if value is not None:
+            self.write_constant(value)
+
+    def fold_expression(self, expression: Expression):
+        """Builds an expression. Without optimize every term is written and None is returned, with it a constant
+        expression writes nothing and returns its value instead"""
+        start = len(self.commands)
+        value = self.build_term(expression.terms[0])
+        for operator, term in zip(expression.operators, expression.terms[1:]):
+            operand_start = len(self.commands)
+            operand = self.build_term(term)
+            if value is not None and operand is not None:
+                folded = fold(operator, value, operand)
+                if folded is not None:
+                    value = folded
+                    continue
+                self.write_constant(value)
+                self.write_constant(operand)
+                self.write_operator(operator)
+            elif operand is not None:
+                self.write_constant_operand(operator, operand, start)
+            elif value is not None:
+                self.write_constant_left_operand(operator, value, operand_start)
+            else:
+                self.write_operator(operator)
+            value = None
+        return value
+
+    def build_term(self, term):
+        """Builds a term and returns None, or with optimize returns the value of a constant term without writing
+        it"""
+        return self.term_builders[type(term)](term)
+
+    def build_integer(self, term: IntegerConstant):
+        if self.optimize:
+            return term.value
+        self.emit('push', 'constant', term.value)
+
+    def build_string(self, term: StringConstant):
+        self.emit('push', 'constant', len(term.value))
+        self.emit('call', 'String.new', 1)
+        for letter in term.value:
+            self.emit('push', 'constant', ord(letter))
+            self.emit('call', 'String.appendChar', 2)
+
+    def build_keyword(self, term: KeywordConstant):
+        if term.value == 'this':
+            self.emit('push', 'pointer', 0)
+        elif self.optimize:
+            return -1 if term.value == 'true' else 0
+        else:
+            self.emit('push', 'constant', 0)
+            if term.value == 'true':
+                self.emit('not')
+
+    def build_variable(self, term: VariableTerm):
+        self.push_variable(term.name)
+
+    def build_array_read(self, term: ArrayTerm):
+        self.build_array_address(term.name, term.index)
+        self.emit('pop', 'pointer', 1)
+        self.emit('push', 'that', 0)
+
+    def build_call(self, call: SubroutineCall):
+        arguments_count = len(call.arguments)
+        if call.receiver is None:
+            self.emit('push', 'pointer', 0)
+            arguments_count += 1
+            name = f'{self.class_name}.{call.name}'
+        elif call.receiver in self.symbol_table.current_scope or call.receiver in self.symbol_table.global_scope:
+            self.push_variable(call.receiver)
+            arguments_count += 1
+            name = f'{self.symbol_table.type_of(call.receiver)}.{call.name}'
+        else:
+            name = f'{call.receiver}.{call.name}'
+        for argument in call.arguments:
+            self.build_expression(argument)
+        self.emit('call', name, arguments_count)
+
+    def build_unary(self, term: UnaryTerm):
+        value = self.build_term(term.term)
+        if value is not None:
+            return wrap(-value) if term.operator == '-' else ~value
+        self.emit('neg' if term.operator == '-' else 'not')
+
+    def build_parenthesized(self, term: ParenthesizedTerm):
+        return self.fold_expression(term.expression)
+
+    def build_array_address(self, name, index):
+        """Builds the address of name[index]"""
+        start = len(self.commands)
+        index = self.fold_expression(index)
+        self.push_variable(name)
+        if index is None:
+            self.emit('add')
+        else:  # the base is the only thing written, a constant index is added to it (or not at all if it's 0)
+            self.write_constant_operand('+', index, start)
+
+    # VARIABLES
+    def segment_of(self, name):
+        """Returns the segment of a variable, None for a subroutine's name of another kind"""
+        kind = self.symbol_table.kind_of(name)
+        if name in self.symbol_table.current_scope:
+            return {'var': 'local', 'arg': 'argument'}.get(kind)
+        return 'static' if kind == 'static' else 'this'
+
+    def push_variable(self, name):
+        segment = self.segment_of(name)
+        if segment is not None:
+            self.emit('push', segment, self.symbol_table.index_of(name))
+
+    def pop_variable(self, name):
+        segment = self.segment_of(name)
+        if segment is not None:
+            self.emit('pop', segment, self.symbol_table.index_of(name))
+
+    # WRITES
+    def write_operator(self, operator):
+        if operator in ARITHMETIC_OPERATORS.keys():
+            self.emit(ARITHMETIC_OPERATORS[operator])
+        elif operator == '*':
+            self.emit('call', 'Math.multiply', 2)
+        elif operator == '/':
+            self.emit('call', 'Math.divide', 2)
+
+    def write_constant(self, value):
+        """Writes the shortest push of a signed 16-bit value, negative ones are the complement of a constant"""
+        if value >= 0:
+            self.emit('push', 'constant', value)
+        else:
+            self.emit('push', 'constant', ~value)
+            self.emit('not')
+
+    def write_constant_operand(self, operator, value, start):
+        """Applies operator to the value written from start and the constant value, skipping the identities"""
+        if operator == '+' and value < 0 < -value <= MAX_CONSTANT:
+            operator, value = '-', -value
+        elif operator == '-' and value < 0 < -value <= MAX_CONSTANT:
+            operator, value = '+', -value
+        if ((operator in ('+', '-', '|') and value == 0) or (operator in ('*', '/') and value == 1)
+                or (operator == '&' and value == -1)):
+            return
+        if operator in ('*', '/') and value == -1:
+            self.emit('neg')
+        elif operator == '*' and value == 0:
+            self.write_constant(0)  # keeps the side effects of the operand
+            self.emit('and')
+        elif operator == '*' and abs(value) & (abs(value) - 1) == 0:
+            self.write_doubling(abs(value).bit_length() - 1, start)
+            if value < 0:
+                self.emit('neg')
+        else:
+            self.write_constant(value)
+            self.write_operator(operator)
+
+    def write_constant_left_operand(self, operator, value, start):
+        """Applies operator to the constant value and the value written from start"""
+        if operator in ('+', '*', '&', '|', '='):
+            self.write_constant_operand(operator, value, start)
+        elif operator == '-':  # value - x = -x + value
+            self.emit('neg')
+            self.write_constant_operand('+', value, start)
+        elif operator in ('<', '>'):  # value < x = x > value
+            self.write_constant_operand('>' if operator == '<' else '<', value, start)
+        else:  # the dividend is pushed before the divisor
+            position = len(self.commands)
+            self.write_constant(value)
+            self.move(position, start)
+            self.write_operator(operator)
+
+    def write_doubling(self, times, start):
+        """Multiplies the value written from start by 2 ** times with additions. A value pushed by a single command
+        is pushed again, any other is doubled through temp 1"""
+        operand = self.commands[start:]
+        if times and len(operand) == 1 and operand[0].opcode == 'push':
+            self.commands.append(operand[0])
+            self.emit('add')
+            times -= 1
+        for _ in range(times):
+            self.emit('pop', 'temp', 1)
+            self.emit('push', 'temp', 1)
+            self.emit('push', 'temp', 1)
+            self.emit('add')
+
+    def move(self, start, position):
+        """Moves the commands written since start back to position, before the ones written from there"""
+        moved = self.commands[start:]
+        del self.commands[start:]
+        self.commands[position:position] = moved
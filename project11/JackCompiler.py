@@ -1,41 +1,188 @@
-import sys, os
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from BuildCache import BuildCache
 from CompilationEngine import CompilationEngine
+from JackTokenizer import JackTokenizer
+from Parser import Parser
+from XMLWriter import XMLWriter
+from Profiler import Profiler, DISABLED
+
+CACHE_FILE = '.jackcache'
+# the compiler's version is the hash of its own sources, so changing the compiler invalidates the cache
+COMPILER_FILES = ['JackCompiler.py', 'CompilationEngine.py', 'JackTokenizer.py', 'Parser.py', 'AST.py', 'IRBuilder.py',
+                  'IR.py', 'ControlFlowOptimizer.py', 'CodeGenerator.py', 'SymbolTable.py', 'VMWriter.py',
+                  'CONSTANTS.py', 'Profiler.py']
+COMPILER_VERSION = BuildCache.hash_files(
+    [os.path.join(os.path.dirname(os.path.abspath(__file__)), file) for file in COMPILER_FILES])
+
+
+def output_of(file_path):
+    return file_path[:-4] + "vm"
+
+
+def compile_file(file_path, profile=False, optimize=False):
+    """Compiles a single .jack file into a .vm file next to it. Returns an error message (None on success), the
+    report of the compilation's profile (None unless profile) and the commands the control flow optimizer removed
+    by kind (None unless optimize)"""
+    profiler = Profiler() if profile else DISABLED
+    profiler.start()
+    try:
+        error, removed = profiled_compile(file_path, profiler, optimize)
+    finally:
+        profiler.stop()
+    return error, profiler.report() if profile else None, removed
+
+
+def profiled_compile(file_path, profiler, optimize=False):
+    """Compiles a single .jack file, recording its stages in profiler. Returns an error message (None on success)
+    and the commands the control flow optimizer removed by kind (None unless optimize)"""
+    output = output_of(file_path)
+    if os.path.exists(output):
+        os.remove(output)
+    compiler = None
+    try:
+        compiler = CompilationEngine(file_path, output, profiler=profiler, optimize=optimize)
+        compiler.compile_class()
+    except Exception as e:
+        if compiler is None:
+            return f"{file_path}: {type(e).__name__}: {e}", None
+        return f"{file_path}:{compiler.line_number()}: {type(e).__name__}: {e}", None
+    return None, compiler.control_flow.removed if optimize else None
+
+
+def analyze_file(file_path):
+    """Writes the XML parse tree of a single .jack file next to it, as project 10's analyzer does. Returns an error
+    message, or None on success"""
+    tokenizer = None
+    try:
+        tokenizer = JackTokenizer(file_path)
+        text = XMLWriter().write_class(Parser(tokenizer).parse_class())
+    except Exception as e:
+        line = f":{tokenizer.line_number()}" if tokenizer is not None else ""
+        return f"{file_path}{line}: {type(e).__name__}: {e}"
+    with open(file_path[:-4] + "xml", "w") as out_file:
+        out_file.write(text)
+    return None
+
+
+def analyze_files(files, jobs=1):
+    """Writes the parse tree of every file, across a process pool when jobs > 1. Returns the errors in the order
+    of files"""
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(analyze_file, files))
+    else:
+        results = [analyze_file(file) for file in files]
+    return [error for error in results if error is not None]
+
+
+def compile_files(files, jobs=1, profile=False, optimize=False):
+    """Compiles every file, across a process pool when jobs > 1. Returns the error (None on success), profile
+    report and removed commands of each file in the order of files"""
+    compile_one = partial(compile_file, profile=profile, optimize=optimize)
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(compile_one, files))
+    return [compile_one(file) for file in files]
+
+
+def build(files, cache, jobs=1, force=False, profiler=DISABLED, optimize=False):
+    """Compiles the files whose source or output changed since they were recorded in cache (all of them if force)
+    and records the ones that compiled. The profiles of the compilations are merged into profiler.
+    Returns the errors, the number of files skipped and the commands the control flow optimizer removed from every
+    class compiled, by kind"""
+    stale = [file for file in files
+             if force or not cache.is_fresh(os.path.basename(file), [file], output_of(file))]
+    for file in stale:
+        print(f"Processing {os.path.basename(file)}")
+    errors = []
+    removed = {}
+    for file, (error, report, file_removed) in zip(stale, compile_files(stale, jobs, profiler.enabled, optimize)):
+        if report is not None:
+            profiler.merge(report)
+        if error is None:
+            cache.record(os.path.basename(file), [file], output_of(file))
+            if file_removed is not None:
+                removed[os.path.basename(file)] = file_removed
+        else:
+            cache.forget(os.path.basename(file))
+            errors.append(error)
+    cache.save()
+    return errors, len(files) - len(stale), removed
+
+
+def print_removed(removed):
+    """Prints the commands the control flow optimizer removed from every class"""
+    print("Control flow optimizer removed VM commands:")
+    width = max(len(file) for file in removed)
+    for file, kinds in removed.items():
+        details = ", ".join(f"{kind} {count}" for kind, count in kinds.items())
+        print(f"  {file:<{width}} {sum(kinds.values()):>6}  ({details})")
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: JackAnalyzer  <path/to/dir | file.jack>")
-    #    exit(1)
+    parser = argparse.ArgumentParser(prog="JackCompiler",
+                                     usage="JackCompiler <path/to/dir | file.jack> [--jobs N] [--force] [--optimize] "
+                                           "[--profile [FILE]] [--xml]")
+    parser.add_argument("path")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of files compiled in parallel")
+    parser.add_argument("--force", action="store_true", help=f"recompile files even if {CACHE_FILE} says they are up to date")
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="fold constant expressions, turn multiplications by powers of two into additions and "
+                             "remove unreachable code and redundant jumps, reporting what was removed from each class")
+    parser.add_argument("--profile", nargs="?", const="-", metavar="FILE",
+                        help="write the time and peak memory of every stage as JSON to FILE (printed without one)")
+    parser.add_argument("--xml", action="store_true",
+                        help="write the parse tree of every class as XML next to it (as project 10's analyzer does) "
+                             "instead of compiling")
+    args = parser.parse_args()
 
-    user_input = '11/Average/Main.jack'#sys.argv[1]
+    user_input = args.path
     # Single file:
     if os.path.isfile(user_input) and user_input.endswith('.jack'):
-        output = os.path.join(user_input[:-4] + "vm")
-        if os.path.exists(output):
-            os.remove(output)
-        compiler = CompilationEngine(user_input, output)
-        compiler.compile_class()
-        print("Done compiling")
-        exit(0)
+        files = [user_input]
+        path = os.path.dirname(user_input)
 
     # Dir
-    if os.path.isdir(user_input):
+    elif os.path.isdir(user_input):
         path = user_input.rstrip('/').rstrip('\\')
-        for file in os.listdir(user_input):
-            if file.endswith('.jack'):
-                print(f"Processing {file}")
-                file_path = os.path.join(path, file)
-                output = os.path.join(path, file[:-4] + "vm")
-                if os.path.exists(output):
-                    os.remove(output)
-                compiler = CompilationEngine(file_path, output)
-                compiler.compile_class()
-        print("Done compiling")
-        exit(0)
+        files = [os.path.join(path, file) for file in sorted(os.listdir(user_input)) if file.endswith('.jack')]
 
     else:
         print("Expected <path/to/dir | file.jack>; Gotten " + user_input)
-        exit(2)
+        sys.exit(2)
+
+    if args.xml:
+        errors = analyze_files(files, args.jobs)
+        for error in errors:
+            print(f"ERROR: {error}")
+        if errors:
+            print(f"Failed analyzing {len(errors)} of {len(files)} files")
+            sys.exit(3)
+        print("Done analyzing")
+        sys.exit(0)
+
+    # optimized output is never taken for unoptimized output, and the other way around
+    cache = BuildCache(os.path.join(path, CACHE_FILE), COMPILER_VERSION + (" --optimize" if args.optimize else ""))
+    profiler = Profiler() if args.profile else DISABLED
+    errors, skipped, removed = build(files, cache, args.jobs, args.force, profiler, args.optimize)
+    if removed:
+        print_removed(removed)
+    if args.profile:
+        profiler.count("files", len(files) - skipped)
+        profiler.write_report(args.profile)
+    if skipped:
+        print(f"{skipped} of {len(files)} files up to date")
+    for error in errors:
+        print(f"ERROR: {error}")
+    if errors:
+        print(f"Failed compiling {len(errors)} of {len(files)} files")
+        sys.exit(3)
+    print("Done compiling")
+    sys.exit(0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,231 @@
+from AST import *
+from CONSTANTS import *
+
+
+class Parser:
+    """Parses the tokens of a Jack class into its syntax tree (see AST), which the compiler lowers into VM code and
+    the XML writer writes as the analyzer's parse tree"""
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.statement_parsers = {
+            'let': self.parse_let,
+            'do': self.parse_do,
+            'while': self.parse_while,
+            'if': self.parse_if,
+            'return': self.parse_return,
+        }
+
+    def advance(self):
+        return self.tokenizer.advance()
+
+    def next_value(self):
+        """Advances and returns the value of the token"""
+        return self.tokenizer.advance()[1]
+
+    def line_number(self):
+        return self.tokenizer.line_number()
+
+    # CHECKERS
+    def is_next_value_in_list(self, lst):
+        token, value = self.tokenizer.peek()
+        return value in lst
+
+    def is_next_value(self, value):
+        token, value_ = self.tokenizer.peek()
+        return value == value_
+
+    def is_next_token(self, token):
+        token_, value = self.tokenizer.peek()
+        return token_ == token
+
+    def has_class_var_dec(self):
+        return self.is_next_value('field') or self.is_next_value('static')
+
+    def has_subroutine(self):
+        return (self.is_next_value('constructor') or self.is_next_value('function')
+                or self.is_next_value('method'))
+
+    def has_var_dec(self):
+        return self.is_next_value('var')
+
+    def has_term(self):
+        return self.is_next_token('integerConstant') or self.is_next_token('stringConstant') \
+            or self.is_next_token('identifier') or self.is_next_value('(')\
+            or self.is_next_value_in_list(UNARY_OPERATORS) or self.is_next_value_in_list(KEYWORD_CONSTANTS)
+
+    def has_parameter(self):
+        return not self.is_next_token('symbol') and not self.is_next_token('ERROR')
+
+    # PARSERS
+    def parse_class(self) -> Class:
+        self.advance()  # 'class'
+        name = self.next_value()
+        self.advance()  # '{'
+        variables = []
+        while self.has_class_var_dec():
+            kind = self.next_value()
+            type_ = self.next_value()
+            variables.append(ClassVarDec(kind, type_, self.parse_names()))
+        subroutines = []
+        while self.has_subroutine():
+            subroutines.append(self.parse_subroutine())
+        self.advance()  # '}'
+        return Class(name, variables, subroutines)
+
+    def parse_names(self) -> list:
+        """Parses name (',' name)* ';' of a declaration"""
+        names = [self.next_value()]
+        while self.is_next_value(','):
+            self.advance()  # ','
+            names.append(self.next_value())
+        self.advance()  # ';'
+        return names
+
+    def parse_subroutine(self) -> Subroutine:
+        kind = self.next_value()
+        line = self.line_number()
+        return_type = self.next_value()
+        name = self.next_value()
+        self.advance()  # '('
+        parameters = []
+        while self.has_parameter():
+            type_ = self.next_value()
+            parameters.append(Parameter(type_, self.next_value()))
+            if self.is_next_value(','):
+                self.advance()
+        self.advance()  # ')'
+        self.advance()  # '{'
+        variables = []
+        while self.has_var_dec():
+            self.advance()  # 'var'
+            type_ = self.next_value()
+            variables.append(VarDec(type_, self.parse_names()))
+        statements = self.parse_statements()
+        self.advance()  # '}'
+        return Subroutine(kind, return_type, name, parameters, variables, statements, line)
+
+    def parse_statements(self) -> list:
+        statements = []
+        parse = self.statement_parsers.get(self.tokenizer.peek()[1])
+        while parse is not None:
+            statements.append(parse())
+            parse = self.statement_parsers.get(self.tokenizer.peek()[1])
+        return statements
+
+    def parse_block(self) -> list:
+        """Parses '{' statements '}'"""
+        self.advance()  # '{'
+        statements = self.parse_statements()
+        self.advance()  # '}'
+        return statements
+
+    def parse_let(self) -> LetStatement:
+        self.advance()  # 'let'
+        line = self.line_number()
+        name = self.next_value()
+        index = self.parse_array_index() if self.is_next_value('[') else None
+        self.advance()  # '='
+        value = self.parse_expression()
+        self.advance()  # ';'
+        return LetStatement(name, index, value, line)
+
+    def parse_if(self) -> IfStatement:
+        self.advance()  # 'if'
+        line = self.line_number()
+        condition = self.parse_condition()
+        statements = self.parse_block()
+        else_statements = None
+        if self.is_next_value('else'):
+            self.advance()  # 'else'
+            else_statements = self.parse_block()
+        return IfStatement(condition, statements, else_statements, line)
+
+    def parse_while(self) -> WhileStatement:
+        self.advance()  # 'while'
+        line = self.line_number()
+        condition = self.parse_condition()
+        return WhileStatement(condition, self.parse_block(), line)
+
+    def parse_condition(self) -> Expression:
+        """Parses '(' expression ')'"""
+        self.advance()  # '('
+        condition = self.parse_expression()
+        self.advance()  # ')'
+        return condition
+
+    def parse_do(self) -> DoStatement:
+        self.advance()  # 'do'
+        line = self.line_number()
+        call = self.parse_subroutine_call(self.next_value())
+        self.advance()  # ';'
+        return DoStatement(call, line)
+
+    def parse_return(self) -> ReturnStatement:
+        self.advance()  # 'return'
+        line = self.line_number()
+        value = self.parse_expression() if self.has_term() else None
+        self.advance()  # ';'
+        return ReturnStatement(value, line)
+
+    def parse_expression(self) -> Expression:
+        terms = [self.parse_term()]
+        operators = []
+        while self.is_next_value_in_list(BINARY_OPERATORS):
+            operators.append(self.next_value())
+            terms.append(self.parse_term())
+        return Expression(terms, operators)
+
+    def parse_expression_list(self) -> list:
+        expressions = []
+        if self.has_term():
+            expressions.append(self.parse_expression())
+        while self.is_next_value(','):
+            self.advance()  # ','
+            expressions.append(self.parse_expression())
+        return expressions
+
+    def parse_term(self):
+        token, value = self.tokenizer.peek()  # a term is told by its first token alone
+        if token == 'identifier':
+            self.advance()
+            if self.is_next_value('['):
+                return ArrayTerm(value, self.parse_array_index())
+            if self.is_next_value('(') or self.is_next_value('.'):
+                return self.parse_subroutine_call(value)
+            return VariableTerm(value)
+        if token == 'integerConstant':
+            self.advance()
+            return IntegerConstant(int(value))
+        if token == 'stringConstant':
+            self.advance()
+            return StringConstant(value)
+        if value in KEYWORD_CONSTANTS:
+            self.advance()
+            return KeywordConstant(value)
+        if value in UNARY_OPERATORS:
+            self.advance()
+            return UnaryTerm(value, self.parse_term())
+        if value == '(':
+            self.advance()
+            expression = self.parse_expression()
+            self.advance()  # ')'
+            return ParenthesizedTerm(expression)
+        raise ValueError(f'Expected a term; Gotten {value}')
+
+    def parse_subroutine_call(self, name) -> SubroutineCall:
+        """Parses the rest of name(arguments) or name.subroutine(arguments), name was already read"""
+        receiver = None
+        if self.is_next_value('.'):
+            self.advance()  # '.'
+            receiver, name = name, self.next_value()
+        self.advance()  # '('
+        arguments = self.parse_expression_list()
+        self.advance()  # ')'
+        return SubroutineCall(receiver, name, arguments)
+
+    def parse_array_index(self) -> Expression:
+        """Parses '[' expression ']'"""
+        self.advance()  # '['
+        index = self.parse_expression()
+        self.advance()  # ']'
+        return index
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import time
+from JackTokenizer import JackTokenizer
+
+
+def build_corpus(path, repeat):
+    """Concatenates every .jack file in path (or path itself) repeat times into one temporary file"""
+    if os.path.isdir(path):
+        files = [os.path.join(path, file) for file in sorted(os.listdir(path)) if file.endswith('.jack')]
+    else:
+        files = [path]
+    sources = []
+    for file in files:
+        with open(file, 'r') as f:
+            sources.append(f.read())
+    with tempfile.NamedTemporaryFile('w', suffix='.jack', delete=False) as corpus:
+        corpus.write('\n'.join(sources * repeat))
+    return corpus.name
+
+
+def time_tokenize(corpus, single_pass, rounds):
+    """Returns the tokens and the best time (in seconds) of tokenizing corpus in the given mode"""
+    tokenizer = JackTokenizer(corpus, single_pass)
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        tokenizer.tokenize()
+        best = min(best, time.perf_counter() - start)
+    return tokenizer.tokens, best
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print('Usage: TokenizerBenchmark <path/to/dir | file.jack> [repeat]')
+        sys.exit(1)
+    repeat = int(sys.argv[2]) if len(sys.argv) == 3 else 200
+    corpus = build_corpus(sys.argv[1], repeat)
+    try:
+        word_tokens, word_time = time_tokenize(corpus, False, 5)
+        single_tokens, single_time = time_tokenize(corpus, True, 5)
+    finally:
+        os.remove(corpus)
+    if word_tokens != single_tokens:
+        print('ERROR: the tokenizer modes disagree')
+        sys.exit(2)
+    print(f'{len(single_tokens)} tokens')
+    print(f'WORD + token_type: {word_time:.4f}s ({len(word_tokens) / word_time:,.0f} tokens/s)')
+    print(f'TOKEN_REGEX:       {single_time:.4f}s ({len(single_tokens) / single_time:,.0f} tokens/s)')
+    print(f'Speedup: {word_time / single_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
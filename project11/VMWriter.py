@@ -1,40 +1,48 @@
 # DONE
 class VMWriter:
+    """Buffers the emitted VM commands in memory and writes them to the output file once, on close.
+    Without an output file the commands stay in memory"""
     def __init__(self, output_file):
         self.output_file = output_file
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def write_push(self, segment, index):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'push {segment} {index}\n')
+        self.commands.append(f'push {segment} {index}')
 
     def write_pop(self, segment, index):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'pop {segment} {index}\n')
+        self.commands.append(f'pop {segment} {index}')
 
     def write_arithmetic(self, command):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'{command}\n')
+        self.commands.append(command)
 
     def write_label(self, label):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'label {label}\n')
+        self.commands.append(f'label {label}')
 
     def write_goto(self, label):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'goto {label}\n')
+        self.commands.append(f'goto {label}')
 
     def write_if_goto(self, label):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'if-goto {label}\n')
+        self.commands.append(f'if-goto {label}')
 
     def write_call(self, name, n_args):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'call {name} {n_args}\n')
+        self.commands.append(f'call {name} {n_args}')
 
     def write_function(self, name, n_vars):
-        with open(self.output_file, 'a') as out_file:
-            out_file.write(f'function {name} {n_vars}\n')
+        self.commands.append(f'function {name} {n_vars}')
 
     def write_return(self):
+        self.commands.append('return')
+
+    def close(self):
+        """writes every buffered command to the output file with a single open and clears the buffer"""
+        if not self.commands or self.output_file is None:
+            return
         with open(self.output_file, 'a') as out_file:
-            out_file.write(f'return\n')
+            out_file.write('\n'.join(self.commands) + '\n')
+        self.commands = []
@@ -0,0 +1,206 @@
+from AST import *
+from CONSTANTS import KEYWORDS
+
+INDENT = '  '
+ESCAPED_SYMBOLS = {'<': '&lt;', '>': '&gt;', '"': '&quot;', '&': '&amp;'}
+
+
+class XMLWriter:
+    """Writes the syntax tree of a class as the XML parse tree of project 10's analyzer, line for line"""
+    def __init__(self):
+        self.lines = []
+        self.indent = ''
+
+    def write_class(self, class_: Class) -> str:
+        """Returns the XML of a class"""
+        self.lines = []
+        self.non_terminal('class', self.write_class_body, class_)
+        return ''.join(self.lines)
+
+    # TAGS
+    def non_terminal(self, rule, write, *args):
+        """Writes <rule>, what write(*args) writes one level deeper, and </rule>"""
+        self.lines.append(f'{self.indent}<{rule}>\n')
+        outer = self.indent
+        self.indent += INDENT
+        write(*args)
+        self.indent = outer
+        self.lines.append(f'{self.indent}</{rule}>\n')
+
+    def terminal(self, token, value):
+        self.lines.append(f'{self.indent}<{token}> {value} </{token}>\n')
+
+    def keyword(self, value):
+        self.terminal('keyword', value)
+
+    def symbol(self, value):
+        self.terminal('symbol', ESCAPED_SYMBOLS.get(value, value))
+
+    def identifier(self, value):
+        self.terminal('identifier', value)
+
+    def type(self, value):
+        """A type is a keyword (int, char, boolean, void) or a class name"""
+        self.terminal('keyword' if value in KEYWORDS else 'identifier', value)
+
+    def names(self, names):
+        """Writes name (',' name)* ';'"""
+        for position, name in enumerate(names):
+            if position:
+                self.symbol(',')
+            self.identifier(name)
+        self.symbol(';')
+
+    # DECLARATIONS
+    def write_class_body(self, class_: Class):
+        self.keyword('class')
+        self.identifier(class_.name)
+        self.symbol('{')
+        for declaration in class_.variables:
+            self.non_terminal('classVarDec', self.write_class_var_dec, declaration)
+        for subroutine in class_.subroutines:
+            self.non_terminal('subroutineDec', self.write_subroutine, subroutine)
+        self.symbol('}')
+
+    def write_class_var_dec(self, declaration: ClassVarDec):
+        self.keyword(declaration.kind)
+        self.type(declaration.type)
+        self.names(declaration.names)
+
+    def write_subroutine(self, subroutine: Subroutine):
+        self.keyword(subroutine.kind)
+        self.type(subroutine.return_type)
+        self.identifier(subroutine.name)
+        self.symbol('(')
+        self.non_terminal('parameterList', self.write_parameters, subroutine.parameters)
+        self.symbol(')')
+        self.non_terminal('subroutineBody', self.write_subroutine_body, subroutine)
+
+    def write_parameters(self, parameters):
+        for position, parameter in enumerate(parameters):
+            if position:
+                self.symbol(',')
+            self.type(parameter.type)
+            self.identifier(parameter.name)
+
+    def write_subroutine_body(self, subroutine: Subroutine):
+        self.symbol('{')
+        for declaration in subroutine.variables:
+            self.non_terminal('varDec', self.write_var_dec, declaration)
+        self.non_terminal('statements', self.write_statements, subroutine.statements)
+        self.symbol('}')
+
+    def write_var_dec(self, declaration: VarDec):
+        self.keyword('var')
+        self.type(declaration.type)
+        self.names(declaration.names)
+
+    # STATEMENTS
+    def write_statements(self, statements):
+        for statement in statements:
+            if type(statement) is LetStatement:
+                self.non_terminal('letStatement', self.write_let, statement)
+            elif type(statement) is IfStatement:
+                self.non_terminal('ifStatement', self.write_if, statement)
+            elif type(statement) is WhileStatement:
+                self.non_terminal('whileStatement', self.write_while, statement)
+            elif type(statement) is DoStatement:
+                self.non_terminal('doStatement', self.write_do, statement)
+            else:
+                self.non_terminal('returnStatement', self.write_return, statement)
+
+    def write_block(self, statements):
+        """Writes '{' statements '}'"""
+        self.symbol('{')
+        self.non_terminal('statements', self.write_statements, statements)
+        self.symbol('}')
+
+    def write_let(self, statement: LetStatement):
+        self.keyword('let')
+        self.identifier(statement.name)
+        if statement.index is not None:
+            self.write_index(statement.index)
+        self.symbol('=')
+        self.write_expression(statement.value)
+        self.symbol(';')
+
+    def write_if(self, statement: IfStatement):
+        self.keyword('if')
+        self.write_condition(statement.condition)
+        self.write_block(statement.statements)
+        if statement.else_statements is not None:
+            self.keyword('else')
+            self.write_block(statement.else_statements)
+
+    def write_while(self, statement: WhileStatement):
+        self.keyword('while')
+        self.write_condition(statement.condition)
+        self.write_block(statement.statements)
+
+    def write_condition(self, condition: Expression):
+        self.symbol('(')
+        self.write_expression(condition)
+        self.symbol(')')
+
+    def write_do(self, statement: DoStatement):
+        self.keyword('do')
+        self.write_call(statement.call)
+        self.symbol(';')
+
+    def write_return(self, statement: ReturnStatement):
+        self.keyword('return')
+        if statement.value is not None:
+            self.write_expression(statement.value)
+        self.symbol(';')
+
+    # EXPRESSIONS
+    def write_expression(self, expression: Expression):
+        self.non_terminal('expression', self.write_terms, expression)
+
+    def write_terms(self, expression: Expression):
+        self.non_terminal('term', self.write_term, expression.terms[0])
+        for operator, term in zip(expression.operators, expression.terms[1:]):
+            self.symbol(operator)
+            self.non_terminal('term', self.write_term, term)
+
+    def write_term(self, term):
+        if type(term) is IntegerConstant:
+            self.terminal('integerConstant', term.value)
+        elif type(term) is StringConstant:
+            self.terminal('stringConstant', term.value)
+        elif type(term) is KeywordConstant:
+            self.keyword(term.value)
+        elif type(term) is VariableTerm:
+            self.identifier(term.name)
+        elif type(term) is ArrayTerm:
+            self.identifier(term.name)
+            self.write_index(term.index)
+        elif type(term) is SubroutineCall:
+            self.write_call(term)
+        elif type(term) is UnaryTerm:
+            self.symbol(term.operator)
+            self.non_terminal('term', self.write_term, term.term)
+        else:
+            self.symbol('(')
+            self.write_expression(term.expression)
+            self.symbol(')')
+
+    def write_call(self, call: SubroutineCall):
+        if call.receiver is not None:
+            self.identifier(call.receiver)
+            self.symbol('.')
+        self.identifier(call.name)
+        self.symbol('(')
+        self.non_terminal('expressionList', self.write_arguments, call.arguments)
+        self.symbol(')')
+
+    def write_arguments(self, arguments):
+        for position, argument in enumerate(arguments):
+            if position:
+                self.symbol(',')
+            self.write_expression(argument)
+
+    def write_index(self, index: Expression):
+        self.symbol('[')
+        self.write_expression(index)
+        self.symbol(']')
@@ -1,4 +1,4 @@
-from symtable import SymbolTable
+from VMCommand import VMCommand
 
 SYMBOL_TABLE = {
     # Arithmetic Operators
@@ -21,6 +21,8 @@ SYMBOL_TABLE = {
     'pointer': '@3',
     'temp': '@5'
 }
+BASE_SEGMENTS = frozenset({'local', 'argument', 'this', 'that'})  # segments addressed through a base pointer
+FIXED_SEGMENTS = frozenset({'pointer', 'temp'})  # segments at a fixed address
 
 class CodeTranslator:
     def __init__(self, file: str):
@@ -31,53 +33,50 @@ class CodeTranslator:
         self.file_name = file_name
 
     @staticmethod
-    def translate_arithmetic(command: str) -> list:
+    def translate_arithmetic(command: VMCommand) -> list:
         """Returns a hack assembly command that does the arithmetic operation provided"""
-        args = command.split(' ')
-        return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', SYMBOL_TABLE[args[0]]]
+        return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', SYMBOL_TABLE[command.opcode]]
 
     @staticmethod
-    def translate_negation(command: str) -> list:
+    def translate_negation(command: VMCommand) -> list:
         """Returns a hack assembly command that does the negation provided"""
-        args = command.split(' ')
-        return ['@SP', 'A=M-1', SYMBOL_TABLE[args[0]]]
+        return ['@SP', 'A=M-1', SYMBOL_TABLE[command.opcode]]
 
-    def translate_comparison(self, command: str) -> list:
+    def translate_comparison(self, command: VMCommand) -> list:
         """Returns a hack assembly command that does the comparison provided"""
-        args = command.split(' ')
         label = f'Label{self.label_counter}'
         self.label_counter += 1
         return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', 'D=M-D', 'M=-1',
-                  f'@{label}', SYMBOL_TABLE[args[0]], '@SP', 'A=M-1', 'M=0', f'({label})']
+                  f'@{label}', SYMBOL_TABLE[command.opcode], '@SP', 'A=M-1', 'M=0', f'({label})']
 
-    def translate_push(self, command: str) -> list:
+    def translate_push(self, command: VMCommand) -> list:
         """Returns a hack assembly command that craetes a push to the provided segment"""
-        args = command.split(' ')
-        if args[1] == 'constant':
-            return [f'@{args[2]}', 'D=A', '@SP', 'AM=M+1', 'A=A-1', 'M=D']
-        elif args[1] == 'static':
-            return [f'@{self.file_name[:-3]}.{args[2]}', 'D=M', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1']
-        elif args[1] in ['local', 'argument', 'this', 'that', 'constant', 'temp', 'pointer']:
-            output = [f'@{args[2]}', 'D=A', SYMBOL_TABLE[args[1]]]
-            if args[1] != 'pointer' and args[1] != 'temp':
+        segment, index = command.segment, command.index
+        if segment == 'constant':
+            return [f'@{index}', 'D=A', '@SP', 'AM=M+1', 'A=A-1', 'M=D']
+        elif segment == 'static':
+            return [f'@{self.file_name[:-3]}.{index}', 'D=M', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1']
+        elif segment in BASE_SEGMENTS or segment in FIXED_SEGMENTS:
+            output = [f'@{index}', 'D=A', SYMBOL_TABLE[segment]]
+            if segment in BASE_SEGMENTS:
                 output.append('A=M')
             output.extend(['A=D+A', 'D=M', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1'])
             return output
         else:
             raise Exception(f'Unknown command: {command}')
 
-    def translate_pop(self, command: str) -> list:
+    def translate_pop(self, command: VMCommand) -> list:
         """Returns a hack assembly command that creates a pop from the provided segment"""
-        args = command.split(' ')
-        if args[1] == 'static':
-            return ['@SP', 'AM=M-1', 'D=M', f'@{self.file_name[:-3]}.{args[2]}', 'M=D']
-        elif args[1] in ['local', 'argument', 'this', 'that', 'temp', 'pointer']:
-            output = [f'@{args[2]}', 'D=A', SYMBOL_TABLE[args[1]]]
-            if args[1] != 'pointer' and args[1] != 'temp':
+        segment, index = command.segment, command.index
+        if segment == 'static':
+            return ['@SP', 'AM=M-1', 'D=M', f'@{self.file_name[:-3]}.{index}', 'M=D']
+        elif segment in BASE_SEGMENTS or segment in FIXED_SEGMENTS:
+            output = [f'@{index}', 'D=A', SYMBOL_TABLE[segment]]
+            if segment in BASE_SEGMENTS:
                 output.append('A=M')
             output.extend(['D=D+A', '@R13', 'M=D', '@SP', 'AM=M-1', 'D=M', '@R13', 'A=M', 'M=D'])
             return output
-        elif args[1] == 'constant':
+        elif segment == 'constant':
             raise Exception('Can\'t pop from constant')
         else:
             raise Exception(f'Unknown command: {command}')
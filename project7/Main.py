@@ -1,6 +1,10 @@
 import os
 import sys
 from CodeTranslator import CodeTranslator
+from VMCommand import VMCommand
+
+# commands whose assembly depends on nothing but the command (static ones also depend on the file)
+TEMPLATE_OPCODES = frozenset({'add', 'sub', 'and', 'or', 'neg', 'not', 'push', 'pop'})
 
 
 class VMTranslator:
@@ -10,35 +14,55 @@ class VMTranslator:
         if os.path.exists(self.output_file):
             os.remove(self.output_file)
         self.translator = CodeTranslator(os.path.basename(input_file))
+        translator = self.translator
+        self.dispatch = {
+            'add': translator.translate_arithmetic,
+            'sub': translator.translate_arithmetic,
+            'and': translator.translate_arithmetic,
+            'or': translator.translate_arithmetic,
+            'neg': translator.translate_negation,
+            'not': translator.translate_negation,
+            'eq': translator.translate_comparison,
+            'gt': translator.translate_comparison,
+            'lt': translator.translate_comparison,
+            'push': translator.translate_push,
+            'pop': translator.translate_pop,
+        }
+        self.commands = {}  # line -> its parsed command
+        self.templates = {}  # command -> assembly text of the TEMPLATE_OPCODES commands
 
-    def translate(self, command: str):
+    def parse(self, line: str) -> VMCommand:
+        """Returns the command of a cleaned line, lines repeat a lot so each distinct line is parsed once"""
+        command = self.commands.get(line)
+        if command is None:
+            command = self.commands[line] = VMCommand.parse(line)
+        return command
 
-        args = command.split(' ')
-        if args[0] in ['add', 'sub', 'and', 'or']:
-            return self.translator.translate_arithmetic(command)
-        elif args[0] in ['eq', 'gt', 'lt']:
-            return self.translator.translate_comparison(command)
-        elif args[0] in ['neg', 'not']:
-            return self.translator.translate_negation(command)
+    def translate(self, command: VMCommand) -> list:
+        translate = self.dispatch.get(command.opcode)
+        if translate is None:
+            raise Exception(f'Unknown command: {command}')
+        return translate(command)
 
-        match args[0]:
-            case 'push':
-                return self.translator.translate_push(command)
-            case 'pop':
-                return self.translator.translate_pop(command)
-            case _:
-                raise Exception('Unknown command')
+    def translate_template(self, command: VMCommand) -> str:
+        """Returns the assembly text of command, reusing the text of an equal command when its assembly depends
+        on the command alone"""
+        template = self.templates.get(command)
+        if template is None:
+            template = '\n'.join(self.translate(command)) + '\n'
+            if command.opcode in TEMPLATE_OPCODES:
+                self.templates[command] = template
+        return template
 
     def write(self, in_file: str):
         self.translator.set_file_name(os.path.basename(in_file))
+        self.templates.clear()  # static variables are named after the file
         with open(in_file, 'r') as infile, open(self.output_file, 'a') as outfile:
             for line in infile:
                 cleaned_line = line.split('//')[0]
                 cleaned_line = cleaned_line.strip()
                 if cleaned_line:
-                    translated_line = '\n'.join(self.translate(cleaned_line))
-                    outfile.write(translated_line)
-                    outfile.write('\n')
+                    outfile.write(self.translate_template(self.parse(cleaned_line)))
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
-from symtable import SymbolTable
+from Superinstructions import Superinstruction
+from VMCommand import VMCommand
 
 SYMBOL_TABLE = {
     # Arithmetic Operators
@@ -21,111 +22,180 @@ SYMBOL_TABLE = {
     'pointer': '@3',
     'temp': '@5'
 }
+BASE_SEGMENTS = frozenset({'local', 'argument', 'this', 'that'})  # segments addressed through a base pointer
+FIXED_SEGMENTS = frozenset({'pointer', 'temp'})  # segments at a fixed address
+PUSH_ZERO = VMCommand('push', 'constant', 0)  # initializes a function's locals
+PUSH_TAIL = ['@SP', 'A=M', 'M=D', '@SP', 'M=M+1']  # pushes D
+SHORT_PUSH_TAIL = ['@SP', 'AM=M+1', 'A=A-1', 'M=D']  # pushes D, for constants
+MAX_INCREMENTS = 3  # largest index of a segment word that is addressed with A=A+1 instead of through R13
+
+# The inlined gt and lt by command: the instructions computing a difference d of x (in M) and y (in D) and the jump
+# that holds for a true result. Neither the sign of x-y nor the one of y-x can be trusted when they overflow, which
+# happens only when x and y have different signs, so d is combined with x: d&x when y < 0 and d|x when y >= 0.
+# x < y: d = x-y, true when (d&x or d|x) < 0. x > y: d = !(y-x), true when (d&x or d|x) >= 0
+INLINE_COMPARISONS = {
+    'gt': (['D=D-M', 'D=!D'], 'D;JGE'),
+    'lt': (['D=M-D'], 'D;JLT'),
+}
+
+# Shared comparison routines by command, with the jump that holds for a true result
+COMPARISON_ROUTINES = {
+    'eq': ('$$EQ', 'JEQ'),
+    'gt': ('$$GT', 'JGT'),
+    'lt': ('$$LT', 'JLT'),
+}
 
 
 class CodeTranslator:
-    def __init__(self, file: str):
+    def __init__(self, file: str, trampolines: bool = False, shared_comparisons: bool = False):
         self.file_name = file
         self.func_name = ''
         self.label_counter = 0
+        # calls and returns jump to the shared $$CALL and $$RETURN routines instead of being inlined
+        self.trampolines = trampolines
+        self.trampoline_saving = 0  # instructions the call sites and returns saved over their inlined version
+        # eq, gt and lt jump to the shared $$EQ, $$GT and $$LT routines instead of being inlined
+        self.shared_comparisons = shared_comparisons
+        self.comparison_saving = 0  # instructions the comparison sites saved over their inlined version
+        self.comparisons_used = set()  # commands whose routine has to be written
+        self.fusion_sites = {}  # superinstruction pattern -> number of times it was fused
+        self.fusion_saving = {}  # superinstruction pattern -> instructions its sites saved over the commands
 
     def set_file_name(self, file_name: str):
         self.file_name = file_name
 
     @staticmethod
-    def translate_arithmetic(command: str) -> list:
+    def translate_arithmetic(command: VMCommand) -> list:
         """Returns a hack assembly command that does the arithmetic operation provided"""
-        args = command.split(' ')
-        return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', SYMBOL_TABLE[args[0]]]
+        return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', SYMBOL_TABLE[command.opcode]]
 
     @staticmethod
-    def translate_negation(command: str) -> list:
+    def translate_negation(command: VMCommand) -> list:
         """Returns a hack assembly command that does the negation provided"""
-        args = command.split(' ')
-        return ['@SP', 'A=M-1', SYMBOL_TABLE[args[0]]]
+        return ['@SP', 'A=M-1', SYMBOL_TABLE[command.opcode]]
 
-    def translate_comparison(self, command: str) -> list:
+    def translate_comparison(self, command: VMCommand) -> list:
         """Returns a hack assembly command that does the comparison provided"""
-        args = command.split(' ')
         label = f'Label{self.label_counter}'
         self.label_counter += 1
-        return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', 'D=M-D', 'M=-1',
-                  f'@{label}', SYMBOL_TABLE[args[0]], '@SP', 'A=M-1', 'M=0', f'({label})']
+        inline = self.translate_inline_comparison(command, label)
+        if not self.shared_comparisons:
+            return inline
+        # D = return address
+        output = [f'@{label}', 'D=A', f'@{COMPARISON_ROUTINES[command.opcode][0]}', '0;JMP', f'({label})']
+        self.comparisons_used.add(command.opcode)
+        self.comparison_saving += len(inline) - len(output)
+        return output
+
+    @staticmethod
+    def translate_inline_comparison(command: VMCommand, label: str) -> list:
+        """Returns the inlined comparison replacing x and y with x eq/gt/lt y, which ends at (label).
+        x-y is 0 exactly when x == y even if it overflows, gt and lt branch on the sign of y (see INLINE_COMPARISONS)"""
+        if command.opcode == 'eq':
+            return ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', 'D=M-D', 'M=-1',
+                    f'@{label}', SYMBOL_TABLE['eq'], '@SP', 'A=M-1', 'M=0', f'({label})']
+        difference, jump = INLINE_COMPARISONS[command.opcode]
+        return (['@SP', 'AM=M-1', 'D=M', f'@{label}.YPOS', 'D;JGE',  # D = y
+                 '@SP', 'A=M-1'] + difference + ['D=D&M', 'M=-1', f'@{label}', jump, f'@{label}.FALSE', '0;JMP',
+                f'({label}.YPOS)', '@SP', 'A=M-1'] + difference + ['D=D|M', 'M=-1', f'@{label}', jump,
+                f'({label}.FALSE)', '@SP', 'A=M-1', 'M=0', f'({label})'])
 
-    def translate_push(self, command: str) -> list:
+    def translate_push(self, command: VMCommand) -> list:
         """Returns a hack assembly command that craetes a push to the provided segment"""
-        args = command.split(' ')
-        if args[1] == 'constant':
-            return [f'@{args[2]}', 'D=A', '@SP', 'AM=M+1', 'A=A-1', 'M=D']
-        elif args[1] == 'static':
-            return [f'@{self.file_name[:-3]}.{args[2]}', 'D=M', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1']
-        elif args[1] in ['local', 'argument', 'this', 'that', 'constant', 'temp', 'pointer']:
-            output = [f'@{args[2]}', 'D=A', SYMBOL_TABLE[args[1]]]
-            if args[1] != 'pointer' and args[1] != 'temp':
+        if command.segment == 'constant':
+            return self.translate_load(command) + SHORT_PUSH_TAIL
+        return self.translate_load(command) + PUSH_TAIL
+
+    def translate_load(self, command: VMCommand) -> list:
+        """Returns the hack assembly loading the word a push command pushes into D"""
+        segment, index = command.segment, command.index
+        if segment == 'constant':
+            return [f'@{index}', 'D=A']
+        elif segment == 'static':
+            return [f'@{self.file_name[:-3]}.{index}', 'D=M']
+        elif segment in BASE_SEGMENTS or segment in FIXED_SEGMENTS:
+            output = [f'@{index}', 'D=A', SYMBOL_TABLE[segment]]
+            if segment in BASE_SEGMENTS:
                 output.append('A=M')
-            output.extend(['A=D+A', 'D=M', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1'])
+            output.extend(['A=D+A', 'D=M'])
             return output
         else:
             raise Exception(f'Unknown command: {command}')
 
-    def translate_pop(self, command: str) -> list:
+    def translate_pop(self, command: VMCommand) -> list:
         """Returns a hack assembly command that creates a pop from the provided segment"""
-        args = command.split(' ')
-        if args[1] == 'static':
-            return ['@SP', 'AM=M-1', 'D=M', f'@{self.file_name[:-3]}.{args[2]}', 'M=D']
-        elif args[1] in ['local', 'argument', 'this', 'that', 'temp', 'pointer']:
-            output = [f'@{args[2]}', 'D=A', SYMBOL_TABLE[args[1]]]
-            if args[1] != 'pointer' and args[1] != 'temp':
+        segment, index = command.segment, command.index
+        if segment == 'static':
+            return ['@SP', 'AM=M-1', 'D=M', f'@{self.file_name[:-3]}.{index}', 'M=D']
+        elif segment in BASE_SEGMENTS or segment in FIXED_SEGMENTS:
+            output = [f'@{index}', 'D=A', SYMBOL_TABLE[segment]]
+            if segment in BASE_SEGMENTS:
                 output.append('A=M')
             output.extend(['D=D+A', '@R13', 'M=D', '@SP', 'AM=M-1', 'D=M', '@R13', 'A=M', 'M=D'])
             return output
-        elif args[1] == 'constant':
+        elif segment == 'constant':
             raise Exception('Can\'t pop from constant')
         else:
             raise Exception(f'Unknown command: {command}')
 
-    def translate_label(self, command: str) -> list:
+    def translate_label(self, command: VMCommand) -> list:
         """Returns a hack assembly label"""
-        label = command.split(' ')[1]
-        return [f'({self.func_name}${label})']
+        return [f'({self.func_name}${command.segment})']
 
-    def translate_goto(self, command: str) -> list:
+    def translate_goto(self, command: VMCommand) -> list:
         """Returns a hack assembly unconditional goto command"""
-        label = command.split(' ')[1]
-        return [f'@{self.func_name}${label}', '0;JMP']
+        return [f'@{self.func_name}${command.segment}', '0;JMP']
 
-    def translate_if_goto(self, command: str) -> list:
+    def translate_if_goto(self, command: VMCommand) -> list:
         """Returns a hack assembly if-goto command"""
-        label = command.split(' ')[1]
-        return ['@SP', 'AM=M-1', 'D=M', f'@{self.func_name}${label}', 'D;JNE']
+        return ['@SP', 'AM=M-1', 'D=M', f'@{self.func_name}${command.segment}', 'D;JNE']
 
-    def translate_function(self, command: str) -> list:
+    def translate_function(self, command: VMCommand) -> list:
         """Returns a hack assembly function command"""
-        args = command.split(' ')  # args = [function, func_name, variablesNum]
-        self.func_name = args[1]
+        self.func_name = command.segment
         output = [f'({self.func_name})']
-        for _ in range(int(args[2])):
-            output.extend(self.translate_push('push constant 0'))
+        for _ in range(command.index):
+            output.extend(self.translate_push(PUSH_ZERO))
         return output
 
-    def translate_call(self, command: str) -> list:
+    def translate_call(self, command: VMCommand) -> list:
         """Returns a hack assembly code that cals a function"""
-        args = command.split(' ')
         return_label = f'{self.func_name}$ret.{self.label_counter}'
         self.label_counter += 1
+        inline = self.inline_call(command.segment, command.index, return_label)
+        if not self.trampolines:
+            return inline
+        # R13 = function, R14 = number of arguments, D = return address
+        output = [f'@{command.index}', 'D=A', '@R14', 'M=D', f'@{command.segment}', 'D=A', '@R13', 'M=D',
+                  f'@{return_label}', 'D=A', '@$$CALL', '0;JMP', f'({return_label})']
+        self.trampoline_saving += len(inline) - len(output)
+        return output
+
+    @staticmethod
+    def inline_call(function: str, args_count: int, return_label: str) -> list:
+        """Returns the hack assembly of a call that saves the frame in place"""
         output = [f'@{return_label}', 'D=A', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1']
         # push local, arguments this and that into stack
         for segment in ['LCL', 'ARG', 'THIS', 'THAT']:
             output.extend([f'@{segment}', 'D=M', '@SP', 'A=M', 'M=D', '@SP', 'M=M+1'])
         # argument = SP-5-num_args
-        output.extend(['@SP', 'D=M', '@5', 'D=D-A', f'@{args[2]}', 'D=D-A', '@ARG', 'M=D'])
+        output.extend(['@SP', 'D=M', '@5', 'D=D-A', f'@{args_count}', 'D=D-A', '@ARG', 'M=D'])
         # local = sp, goto func_name and (return_label)
-        output.extend(['@SP', 'D=M', '@LCL', 'M=D', f'@{args[1]}', '0;JMP', f'({return_label})'])
+        output.extend(['@SP', 'D=M', '@LCL', 'M=D', f'@{function}', '0;JMP', f'({return_label})'])
         return output
 
-    @staticmethod
-    def translate_return() -> list:
+    def translate_return(self, command: VMCommand) -> list:
         """Returns a hack assembly code to return from a function"""
+        inline = self.inline_return()
+        if not self.trampolines:
+            return inline
+        output = ['@$$RETURN', '0;JMP']
+        self.trampoline_saving += len(inline) - len(output)
+        return output
+
+    @staticmethod
+    def inline_return() -> list:
+        """Returns the hack assembly of a return that restores the frame in place"""
         output = [
             '@LCL', 'D=M', '@R13', 'M=D',  # Store LCL in R13
             '@5', 'A=D-A', 'D=M', '@R14', 'M=D',  # Store (end_frame -5) in R14
@@ -137,3 +207,106 @@ class CodeTranslator:
             output.extend(['@R13', 'AM=M-1', 'D=M', f'@{segment}', 'M=D'])
         output.extend(['@R14', 'A=M', '0;JMP'])
         return output
+
+    def translate_increment(self, fused: Superinstruction) -> list:
+        """push S i, push constant k, add/sub, pop S i: adds k to S i in place, without going through the stack"""
+        push, constant, operation, _ = fused.commands
+        segment, index, amount = push.segment, push.index, constant.index
+        store, step = ('M=D+M', 'M=M+1') if operation.opcode == 'add' else ('M=M-D', 'M=M-1')
+        if segment in BASE_SEGMENTS and index > MAX_INCREMENTS:
+            if amount == 1:
+                output = [f'@{index}', 'D=A', SYMBOL_TABLE[segment], 'A=D+M', step]
+            else:  # D holds k, so the address goes through R13
+                output = [f'@{index}', 'D=A', SYMBOL_TABLE[segment], 'D=D+M', '@R13', 'M=D',
+                          f'@{amount}', 'D=A', '@R13', 'A=M', store]
+            return self.record_fusion(fused, output)
+        if segment in BASE_SEGMENTS:
+            address = [SYMBOL_TABLE[segment], 'A=M'] + ['A=A+1'] * index
+        elif segment == 'static':
+            address = [f'@{self.file_name[:-3]}.{index}']
+        else:
+            address = [f'@{int(SYMBOL_TABLE[segment][1:]) + index}']
+        if amount == 1:
+            output = address + [step]
+        else:
+            output = [f'@{amount}', 'D=A'] + address + [store]
+        return self.record_fusion(fused, output)
+
+    def translate_array_read(self, fused: Superinstruction) -> list:
+        """push X (or add), pop pointer 1, push that 0: points THAT at the address and pushes the word it holds"""
+        first = fused.commands[0]
+        if first.opcode == 'push':
+            output = self.translate_load(first) + ['@THAT', 'M=D', 'A=D', 'D=M'] + SHORT_PUSH_TAIL
+        else:  # the address is the sum of the two topmost values, which the word replaces
+            # A is set again after the pop, as the peephole optimizer may remove a push and pop pair before it
+            output = ['@SP', 'AM=M-1', 'D=M', '@SP', 'A=M-1', 'D=D+M', '@THAT', 'M=D', 'A=D', 'D=M',
+                      '@SP', 'A=M-1', 'M=D']
+        return self.record_fusion(fused, output)
+
+    def translate_array_write(self, fused: Superinstruction) -> list:
+        """pop temp 0, pop pointer 1, push temp 0, pop that 0: stores the topmost value at the address under it,
+        leaving temp 0 and THAT as the commands do"""
+        output = ['@SP', 'AM=M-1', 'D=M', '@5', 'M=D', '@SP', 'AM=M-1', 'D=M', '@THAT', 'M=D',
+                  '@5', 'D=M', '@THAT', 'A=M', 'M=D']
+        return self.record_fusion(fused, output)
+
+    def translate_not_if_goto(self, fused: Superinstruction) -> list:
+        """not, if-goto L: jumps unless the popped value is true (-1), the exit test of a while loop"""
+        output = ['@SP', 'AM=M-1', 'D=M+1', f'@{self.func_name}${fused.commands[1].segment}', 'D;JNE']
+        return self.record_fusion(fused, output)
+
+    def record_fusion(self, fused: Superinstruction, output: list) -> list:
+        """Counts a superinstruction and the instructions it saved over translating its commands one by one"""
+        translate = {'push': self.translate_push, 'pop': self.translate_pop, 'not': self.translate_negation,
+                     'if-goto': self.translate_if_goto}
+        inline = sum(len(translate.get(command.opcode, self.translate_arithmetic)(command))
+                     for command in fused.commands)
+        self.fusion_sites[fused.opcode] = self.fusion_sites.get(fused.opcode, 0) + 1
+        self.fusion_saving[fused.opcode] = self.fusion_saving.get(fused.opcode, 0) + inline - len(output)
+        return output
+
+    def translate_shared_routines(self) -> list:
+        """Returns the shared routines the translated commands jump to, after a halt loop that keeps a program
+        without Sys.init from running into them"""
+        output = ['($$HALT)', '@$$HALT', '0;JMP']
+        if self.trampolines:
+            output.extend(self.translate_trampolines())
+        for command in sorted(self.comparisons_used):
+            output.extend(self.translate_comparison_routine(command))
+        return output
+
+    @staticmethod
+    def translate_comparison_routine(command: str) -> list:
+        """Returns the routine replacing the two topmost values of the stack, x and y, with x eq/gt/lt y and
+        jumping back to the address in D.
+        x-y overflows when x and y have different signs, so gt and lt only subtract when the signs are the same
+        and otherwise compare by the sign of x alone"""
+        routine, jump = COMPARISON_ROUTINES[command]
+        output = [f'({routine})', '@R15', 'M=D', '@SP', 'AM=M-1', 'A=A-1', 'D=M']  # R15 = return address, D = x
+        if command != 'eq':
+            output.extend([
+                f'@{routine}.XNEG', 'D;JLT',
+                # x >= 0, D = y
+                '@SP', 'A=M', 'D=M', f'@{routine}.DIFF', 'D;JGE', 'D=1', f'@{routine}.END', '0;JMP',
+                f'({routine}.XNEG)',
+                '@SP', 'A=M', 'D=M', f'@{routine}.DIFF', 'D;JLT', 'D=-1', f'@{routine}.END', '0;JMP',
+                f'({routine}.DIFF)', '@SP', 'A=M-1', 'D=M-D'])  # D = x-y
+        else:
+            output.extend(['@SP', 'A=M', 'D=D-M'])  # D = x-y
+        if command != 'eq':
+            output.append(f'({routine}.END)')
+        output.extend(['@SP', 'A=M-1', 'M=-1', '@R15', 'A=M', f'D;{jump}',
+                       '@SP', 'A=M-1', 'M=0', '@R15', 'A=M', '0;JMP'])
+        return output
+
+    def translate_trampolines(self) -> list:
+        """Returns the $$CALL and $$RETURN routines the call sites and returns jump to in trampolines mode"""
+        output = ['($$CALL)', '@SP', 'AM=M+1', 'A=A-1', 'M=D']  # push the return address
+        for segment in ['LCL', 'ARG', 'THIS', 'THAT']:
+            output.extend([f'@{segment}', 'D=M', '@SP', 'AM=M+1', 'A=A-1', 'M=D'])
+        # argument = SP-5-num_args, local = SP, goto R13
+        output.extend(['@R14', 'D=M', '@5', 'D=D+A', '@SP', 'D=M-D', '@ARG', 'M=D',
+                       '@SP', 'D=M', '@LCL', 'M=D', '@R13', 'A=M', '0;JMP'])
+        output.append('($$RETURN)')
+        output.extend(self.inline_return())
+        return output
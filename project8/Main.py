@@ -1,97 +1,270 @@
+import argparse
 import os
 import sys
+import time
+from typing import Iterable, Iterator
+from BuildCache import BuildCache
 from CodeTranslator import CodeTranslator
+from PeepholeOptimizer import PeepholeOptimizer
+from Profiler import Profiler, DISABLED
+from Superinstructions import fuse
+from VMCommand import VMCommand
+
+CACHE_FILE = '.vmcache'
+BUFFER_SIZE = 1024 * 1024  # bytes of translated assembly buffered before they're written to the output file
+# commands whose assembly depends on nothing but the command (static ones also depend on the file)
+TEMPLATE_OPCODES = frozenset({'add', 'sub', 'and', 'or', 'neg', 'not', 'push', 'pop'})
+# the translator's version is the hash of its own sources, so changing it invalidates the cache
+TRANSLATOR_VERSION = BuildCache.hash_files(
+    [os.path.join(os.path.dirname(os.path.abspath(__file__)), file)
+     for file in ['Main.py', 'CodeTranslator.py', 'PeepholeOptimizer.py', 'VMCommand.py', 'Profiler.py',
+                  'Superinstructions.py']])
 
 
 class VMTranslator:
-    def __init__(self, input_file: str, output_file: str):
+    def __init__(self, input_file: str, output_file: str, optimize: bool = False, trampolines: bool = False,
+                 shared_comparisons: bool = False, fuse: bool = False, buffer_size: int = BUFFER_SIZE,
+                 profiler: Profiler = DISABLED):
         self.input_file = input_file
+        self.fuse = fuse  # recurring command sequences are translated as superinstructions
         self.output_file = output_file
-        self.translator = CodeTranslator(os.path.basename(input_file))
-        if os.path.exists(self.output_file):
-            #  Reset the file if it exists by deleting and recreating it
+        self.buffer_size = buffer_size
+        self.profiler = profiler
+        self.translator = CodeTranslator(os.path.basename(input_file), trampolines, shared_comparisons)
+        self.optimizer = PeepholeOptimizer() if optimize else None
+        self.rom_size = 0  # instructions written to the output file
+        self.line_count = 0  # VM commands translated
+        translator = self.translator
+        self.dispatch = {
+            'add': translator.translate_arithmetic,
+            'sub': translator.translate_arithmetic,
+            'and': translator.translate_arithmetic,
+            'or': translator.translate_arithmetic,
+            'neg': translator.translate_negation,
+            'not': translator.translate_negation,
+            'eq': translator.translate_comparison,
+            'gt': translator.translate_comparison,
+            'lt': translator.translate_comparison,
+            'push': translator.translate_push,
+            'pop': translator.translate_pop,
+            'label': translator.translate_label,
+            'goto': translator.translate_goto,
+            'if-goto': translator.translate_if_goto,
+            'function': translator.translate_function,
+            'call': translator.translate_call,
+            'return': translator.translate_return,
+            'increment': translator.translate_increment,
+            'array_read': translator.translate_array_read,
+            'array_write': translator.translate_array_write,
+            'not_if_goto': translator.translate_not_if_goto,
+        }
+        self.commands = {}  # line -> its parsed command
+        self.templates = {}  # command -> (assembly text, instruction count) of the TEMPLATE_OPCODES commands
+        self.line_templates = {}  # command -> (assembly lines, instruction count), when lines are yielded
+        if self.output_file is not None and os.path.exists(self.output_file):
+            #  The file is truncated when it's opened for writing
             print(f'Overwriting {self.output_file}')
-            os.remove(self.output_file)
 
-    def init_file(self):
+    def translate_bootstrap(self, as_lines: bool = False):
         """in case of a multi-file program, initialize the file with OS and Sys.init.
         !!!!!! Must be disabled to test basicLoop, fibonacciSeries, simpleFunction and nestedCall"""
-        with open(self.output_file, 'w') as outfile:
-            commands = ['@256', 'D=A', '@SP', 'M=D']  # bootstrap
-            commands.extend(self.translator.translate_call('call Sys.init 0'))
-            for command in commands:
-                outfile.write(command + '\n')
+        commands = ['@256', 'D=A', '@SP', 'M=D']  # bootstrap
+        commands.extend(self.translator.translate_call(VMCommand('call', 'Sys.init', 0)))
+        self.rom_size += self.count_instructions(commands)
+        return self.output(commands, as_lines)
+
+    def translate_shared_routines(self, as_lines: bool = False):
+        """Returns the $$CALL, $$RETURN and comparison routines the translated commands jump to"""
+        routines = self.translator.translate_shared_routines()
+        self.rom_size += self.count_instructions(routines)
+        return self.output(routines, as_lines)
+
+    @staticmethod
+    def output(lines: list, as_lines: bool):
+        """Returns assembly lines as they are if as_lines, as text otherwise"""
+        return lines if as_lines else '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def count_instructions(lines: list) -> int:
+        return sum(1 for line in lines if not line.startswith('('))
 
-    def translate(self, command: str):
+    def parse(self, line: str) -> VMCommand:
+        """Returns the command of a cleaned line, lines repeat a lot so each distinct line is parsed once"""
+        command = self.commands.get(line)
+        if command is None:
+            command = self.commands[line] = VMCommand.parse(line)
+        return command
+
+    def translate(self, command: VMCommand) -> list:
         """Translate a given command into hack assembly"""
-        args = command.split(' ')
-        if args[0] in ['add', 'sub', 'and', 'or']:
-            return self.translator.translate_arithmetic(command)
-        elif args[0] in ['eq', 'gt', 'lt']:
-            return self.translator.translate_comparison(command)
-        elif args[0] in ['neg', 'not']:
-            return self.translator.translate_negation(command)
-
-        match args[0]:
-            case 'push':
-                return self.translator.translate_push(command)
-            case 'pop':
-                return self.translator.translate_pop(command)
-            case 'label':
-                return self.translator.translate_label(command)
-            case 'goto':
-                return self.translator.translate_goto(command)
-            case 'if-goto':
-                return self.translator.translate_if_goto(command)
-            case 'function':
-                return self.translator.translate_function(command)
-            case 'call':
-                return self.translator.translate_call(command)
-            case 'return':
-                return self.translator.translate_return()
-            case _:
-                raise Exception('Unknown command')
-
-    def write(self, in_file: str):
-        """Goes over every command in in_file and writes the translated commands to the output file."""
-        self.translator.set_file_name(os.path.basename(in_file))
-        with open(in_file, 'r') as infile, open(self.output_file, 'a') as outfile:
+        translate = self.dispatch.get(command.opcode)
+        if translate is None:
+            raise Exception(f'Unknown command: {command}')
+        return translate(command)
+
+    def translate_template(self, command: VMCommand, as_lines: bool = False) -> tuple:
+        """Returns the assembly text (its lines if as_lines) of command and its instruction count, reusing the
+        assembly of an equal command when it depends on the command alone"""
+        templates = self.line_templates if as_lines else self.templates
+        template = templates.get(command)
+        if template is None:
+            translated = self.translate(command)
+            template = (self.output(translated, as_lines), self.count_instructions(translated))
+            if command.opcode in TEMPLATE_OPCODES:
+                templates[command] = template
+        return template
+
+    @staticmethod
+    def read_lines(in_file: str) -> Iterator[str]:
+        """Yields the lines of in_file that hold a command, without their comments and surrounding whitespace"""
+        with open(in_file, 'r') as infile:
             for line in infile:
-                cleaned_line = line.split('//')[0]
-                cleaned_line = cleaned_line.strip()
+                cleaned_line = line.split('//')[0].strip()
                 if cleaned_line:
-                    translated_line = '\n'.join(self.translate(cleaned_line))
-                    outfile.write(translated_line)
-                    outfile.write('\n')
+                    yield cleaned_line
+
+    def translate_file(self, in_file: str) -> Iterator[str]:
+        """Yields the assembly text of every command in in_file"""
+        return self.translate_lines(os.path.basename(in_file), self.read_lines(in_file))
+
+    def translate_lines(self, file_name: str, lines: Iterable[str], as_lines: bool = False) -> Iterator:
+        """Yields the assembly text of every command in lines, the cleaned lines of the file named file_name.
+        The assembly lines of the commands are yielded instead if as_lines, for a stage that reads them in memory"""
+        self.translator.set_file_name(file_name)
+        self.templates.clear()  # static variables are named after the file
+        self.line_templates.clear()
+        commands = map(self.parse, lines)
+        if self.fuse:
+            commands = list(commands)
+            fused = fuse(commands)
+            self.line_count += len(commands) - len(fused)  # the superinstructions count as their commands
+            commands = fused
+        if self.optimizer is not None:
+            # the peephole passes look across commands, so the whole file is translated first
+            translated = []
+            for command in commands:
+                translated.extend(self.translate(command))
+                self.line_count += 1
+            if translated:
+                with self.profiler.stage('translator.optimize'):
+                    optimized = self.optimizer.optimize(translated)
+                self.rom_size += self.count_instructions(optimized)
+                yield self.output(optimized, as_lines)
+            return
+        for command in commands:
+            text, size = self.translate_template(command, as_lines)
+            self.rom_size += size
+            self.line_count += 1
+            yield text
+
+    def translate_program(self, files: list, bootstrap: bool) -> Iterator[str]:
+        """Yields the assembly text of the whole program: the bootstrap, every file and the shared routines"""
+        verbose = os.path.isdir(self.input_file)
+        return self.translate_sources(((os.path.basename(file), self.read_lines(file)) for file in files), bootstrap,
+                                      verbose)
+
+    def translate_sources(self, sources: Iterable[tuple], bootstrap: bool, verbose: bool = False,
+                          as_lines: bool = False) -> Iterator:
+        """Yields the assembly text of the program made of sources, (file name, cleaned lines) pairs, or lists of
+        its assembly lines if as_lines"""
+        if bootstrap:
+            yield self.translate_bootstrap(as_lines)
+        for file_name, lines in sources:
+            if verbose:
+                print(f'Processing {file_name}')
+            yield from self.translate_lines(file_name, lines, as_lines)
+        if self.translator.trampolines or self.translator.shared_comparisons:
+            yield self.translate_shared_routines(as_lines)
+
+    def write(self, files: list, bootstrap: bool = False):
+        """Translates files into the output file, which is written through one buffer of buffer_size bytes"""
+        with self.profiler.stage('translator.translate'):
+            with open(self.output_file, 'w', buffering=self.buffer_size) as outfile:
+                outfile.writelines(self.translate_program(files, bootstrap))
+        self.profiler.count('vm_lines', self.line_count)
+        self.profiler.count('instructions', self.rom_size)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print('Usage: VMTranslator <path/to/dir | file.vm>')
+    parser = argparse.ArgumentParser(
+        prog='VMTranslator', usage='VMTranslator <path/to/dir | file.vm> [--force] [--optimize] [--trampolines] '
+              '[--shared-comparisons] [--fuse] [--buffer-size BYTES] [--profile [FILE]]')
+    parser.add_argument('path')
+    parser.add_argument('--force', action='store_true',
+                        help=f'translate even if {CACHE_FILE} says the output is up to date')
+    parser.add_argument('-O', '--optimize', action='store_true', help='run the peephole optimizer over the output')
+    parser.add_argument('--trampolines', action='store_true',
+                        help='share one $$CALL and one $$RETURN routine between all the calls and returns')
+    parser.add_argument('--shared-comparisons', action='store_true',
+                        help='share one routine between all the eq, one between all the gt and one between all the lt '
+                             'commands: smaller than inlining them but slower')
+    parser.add_argument('--fuse', action='store_true',
+                        help='translate recurring command sequences (increments, array reads and writes, while '
+                             'loop exits) as superinstructions')
+    parser.add_argument('--buffer-size', type=int, default=BUFFER_SIZE, metavar='BYTES',
+                        help='size of the output buffer')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='FILE',
+                        help='write the time and peak memory of every stage as JSON to FILE (printed without one)')
+    args = parser.parse_args()
+    if args.buffer_size < 1:
+        print(f'ERROR: invalid buffer size {args.buffer_size}')
         sys.exit(1)
-    output_file = ''
-    path = sys.argv[1]
+    path = args.path
     if os.path.isdir(path):
         temp = path.strip('/').strip('\\')
         output_file = os.path.join(path, os.path.basename(temp) + '.asm')
-        vm = VMTranslator(path, output_file)
-        files = [file for file in os.listdir(path) if file.endswith('.vm')]
-        if len(files) > 1:
-            print("Multiple vm files found")
-            vm.init_file()
-
-        for file in os.listdir(path):
-            if file.endswith('.vm'):
-                print(f'Processing {file}')
-                vm.write(os.path.join(path, file))
-
-    elif os.path.isfile(path):
-        if path.endswith('.vm'):
-            output_file = path[:-2] + 'asm'
-            vm = VMTranslator(path, output_file)
-            vm.write(path)
-        else:
-            print('ERROR: expect file.vm')
-            sys.exit(1)
+        files = sorted(os.path.join(path, file) for file in os.listdir(path) if file.endswith('.vm'))
+    elif os.path.isfile(path) and path.endswith('.vm'):
+        output_file = path[:-2] + 'asm'
+        files = [path]
+    else:
+        print('ERROR: expect file.vm')
+        sys.exit(1)
+
+    # the options are part of the version, so output built with other options is never up to date
+    options = ''.join(f' --{option}' for option in ['optimize', 'trampolines', 'shared_comparisons', 'fuse']
+                      if getattr(args, option))
+    cache = BuildCache(os.path.join(os.path.dirname(output_file), CACHE_FILE), TRANSLATOR_VERSION + options)
+    target = os.path.basename(output_file)
+    if not args.force and cache.is_fresh(target, files, output_file):
+        print(f'{output_file} is up to date')
+        sys.exit(0)
+
+    profiler = Profiler() if args.profile else DISABLED
+    profiler.start()
+    vm = VMTranslator(path, output_file, args.optimize, args.trampolines, args.shared_comparisons, args.fuse,
+                      args.buffer_size, profiler)
+    if len(files) > 1:
+        print("Multiple vm files found")
+    start = time.perf_counter()
+    vm.write(files, bootstrap=len(files) > 1)
+    elapsed = time.perf_counter() - start
+    profiler.stop()
+    cache.record(target, files, output_file)
+    cache.save()
+    if vm.optimizer is not None:
+        optimizer = vm.optimizer
+        print(f'Peephole optimizer saved {optimizer.saved} instructions '
+              f'({optimizer.original_size} -> {optimizer.optimized_size})')
+    if args.trampolines or args.shared_comparisons:
+        translator = vm.translator
+        inlined_size = (vm.rom_size + translator.trampoline_saving + translator.comparison_saving
+                        - vm.count_instructions(translator.translate_shared_routines()))
+        # the saving is counted before the peephole optimizer, so with it the inlined size is an estimate
+        estimate = '~' if args.optimize else ''
+        print(f'ROM size with shared routines: {vm.rom_size} (inlined: {estimate}{inlined_size})')
+    if args.fuse:
+        translator = vm.translator
+        # the fused sequences are straight-line code, so every instruction a site saves is a cycle saved whenever
+        # it runs. The saving is counted before the peephole optimizer, so with it the saving is an estimate
+        estimate = '~' if args.optimize else ''
+        print('Superinstructions:')
+        for pattern in sorted(translator.fusion_sites):
+            print(f'  {pattern:<12} {translator.fusion_sites[pattern]:>6} sites, '
+                  f'{estimate}{translator.fusion_saving[pattern]} instructions (cycles per run) saved')
 
+    print(f'Translated {vm.line_count} VM lines in {elapsed:.3f}s '
+          f'({vm.line_count / elapsed if elapsed else 0:,.0f} lines per second)')
+    if args.profile:
+        profiler.write_report(args.profile)
     print(f'Done! translated file at {output_file}')
@@ -0,0 +1,157 @@
+PUSH_TAIL = ['@SP', 'A=M', 'M=D', '@SP', 'M=M+1']  # pushes D, as emitted by translate_push
+SHORT_PUSH_TAIL = ['@SP', 'AM=M+1', 'A=A-1', 'M=D']  # pushes D, as emitted for constants
+POP_HEAD = ['@SP', 'AM=M-1', 'D=M']  # pops into D (pop static, if-goto, arithmetic and comparisons)
+POINTER_SEGMENTS = {'@LCL', '@ARG', '@THIS', '@THAT'}
+FIXED_SEGMENTS = {'@3': 3, '@5': 5}  # pointer and temp
+NEGATIONS = {'M=!M': 'D=!M', 'M=-M': 'D=-M'}  # not and neg in place, by the pop that negates instead
+MAX_INCREMENTS = 3  # largest index of a fused pop that is addressed with A=A+1 instead of through R13/R14
+
+
+class PeepholeOptimizer:
+    """Rewrites the hack assembly emitted by CodeTranslator into shorter, equivalent assembly.
+    The passes rely on every CodeTranslator template loading D before reading it, and on the stack above SP
+    being dead"""
+    def __init__(self):
+        self.original_size = 0
+        self.optimized_size = 0
+
+    @property
+    def saved(self) -> int:
+        return self.original_size - self.optimized_size
+
+    def optimize(self, lines: list) -> list:
+        """Returns the optimized lines and adds their instruction counts to the totals"""
+        self.original_size += self.count_instructions(lines)
+        for optimization_pass in (self.shorten_push_tails, self.remove_push_pop_pairs, self.fuse_negation_pops,
+                                  self.fuse_push_pop_segment, self.push_constant_bits, self.fuse_zero_pushes,
+                                  self.remove_redundant_loads):
+            lines = optimization_pass(lines)
+        self.optimized_size += self.count_instructions(lines)
+        return lines
+
+    @staticmethod
+    def count_instructions(lines: list) -> int:
+        return sum(1 for line in lines if not line.startswith('('))
+
+    @staticmethod
+    def matches(lines: list, index: int, pattern: list) -> bool:
+        return lines[index:index + len(pattern)] == pattern
+
+    def shorten_push_tails(self, lines: list) -> list:
+        """@SP A=M M=D @SP M=M+1 -> @SP AM=M+1 A=A-1 M=D"""
+        output = []
+        index = 0
+        while index < len(lines):
+            if self.matches(lines, index, PUSH_TAIL):
+                output.extend(SHORT_PUSH_TAIL)
+                index += len(PUSH_TAIL)
+            else:
+                output.append(lines[index])
+                index += 1
+        return output
+
+    def remove_push_pop_pairs(self, lines: list) -> list:
+        """A push of D followed by a pop into D leaves D and SP as they were"""
+        output = []
+        index = 0
+        while index < len(lines):
+            if self.matches(lines, index, SHORT_PUSH_TAIL + POP_HEAD):
+                index += len(SHORT_PUSH_TAIL) + len(POP_HEAD)
+            else:
+                output.append(lines[index])
+                index += 1
+        return output
+
+    def fuse_negation_pops(self, lines: list) -> list:
+        """A not (or neg) followed by a pop into D pops the negated value into D (not, if-goto for example)"""
+        output = []
+        index = 0
+        while index < len(lines):
+            window = lines[index:index + 3 + len(POP_HEAD)]
+            if window[:2] == ['@SP', 'A=M-1'] and window[2:3] and window[2] in NEGATIONS and window[3:] == POP_HEAD:
+                output.extend(POP_HEAD[:-1] + [NEGATIONS[window[2]]])
+                index += len(window)
+            else:
+                output.append(lines[index])
+                index += 1
+        return output
+
+    def fuse_push_pop_segment(self, lines: list) -> list:
+        """A push of D followed by a pop to a segment stores D in the segment directly"""
+        output = []
+        index = 0
+        while index < len(lines):
+            if self.matches(lines, index, SHORT_PUSH_TAIL):
+                fused, length = self.fuse_pop_segment(lines, index + len(SHORT_PUSH_TAIL))
+                if fused is not None:
+                    output.extend(fused)
+                    index += len(SHORT_PUSH_TAIL) + length
+                    continue
+            output.append(lines[index])
+            index += 1
+        return output
+
+    @staticmethod
+    def fuse_pop_segment(lines: list, index: int) -> tuple:
+        """Returns the lines storing D to the segment popped at index and the length of that pop,
+        or (None, 0) if a pop to a segment doesn't start at index"""
+        window = lines[index:index + 13]
+        if len(window) < 12 or not window[0][1:].isdigit() or window[1] != 'D=A':
+            return None, 0
+        segment_index = int(window[0][1:])
+        pop_tail = ['@R13', 'M=D', '@SP', 'AM=M-1', 'D=M', '@R13', 'A=M', 'M=D']
+        # pop local/argument/this/that i
+        if window[2] in POINTER_SEGMENTS and window[3:5] == ['A=M', 'D=D+A'] and window[5:13] == pop_tail:
+            if segment_index <= MAX_INCREMENTS:
+                return [window[2], 'A=M'] + ['A=A+1'] * segment_index + ['M=D'], 13
+            return ['@R13', 'M=D', window[0], 'D=A', window[2], 'D=D+M', '@R14', 'M=D',
+                    '@R13', 'D=M', '@R14', 'A=M', 'M=D'], 13
+        # pop pointer/temp i
+        if window[2] in FIXED_SEGMENTS and window[3] == 'D=D+A' and window[4:12] == pop_tail:
+            return [f'@{FIXED_SEGMENTS[window[2]] + segment_index}', 'M=D'], 12
+        return None, 0
+
+    def push_constant_bits(self, lines: list) -> list:
+        """@0 D=A push D -> push 0 without going through D (same for 1)"""
+        output = []
+        index = 0
+        while index < len(lines):
+            if lines[index] in ('@0', '@1') and self.matches(lines, index + 1, ['D=A'] + SHORT_PUSH_TAIL):
+                output.extend(SHORT_PUSH_TAIL[:-1] + [f'M={lines[index][1:]}'])
+                index += 2 + len(SHORT_PUSH_TAIL)
+            else:
+                output.append(lines[index])
+                index += 1
+        return output
+
+    def fuse_zero_pushes(self, lines: list) -> list:
+        """Pushes three or more zeros (a function's locals) by walking A over the stack and setting SP once"""
+        push_zero = SHORT_PUSH_TAIL[:-1] + ['M=0']
+        output = []
+        index = 0
+        while index < len(lines):
+            count = 0
+            while self.matches(lines, index + count * len(push_zero), push_zero):
+                count += 1
+            if count >= 3:
+                output.extend(['@SP', 'A=M', 'M=0'] + ['A=A+1', 'M=0'] * (count - 1) + ['D=A+1', '@SP', 'M=D'])
+                index += count * len(push_zero)
+            else:
+                output.append(lines[index])
+                index += 1
+        return output
+
+    @staticmethod
+    def remove_redundant_loads(lines: list) -> list:
+        """Removes @X when A already holds X. A is forgotten at labels and after instructions that write it"""
+        output = []
+        loaded = None
+        for line in lines:
+            if line.startswith('@'):
+                if line == loaded:
+                    continue
+                loaded = line
+            elif line.startswith('(') or ('=' in line and 'A' in line.split('=')[0]):
+                loaded = None
+            output.append(line)
+        return output
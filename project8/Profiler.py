@@ -0,0 +1,95 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class Profiler:
+    """Records the wall time and the peak traced memory of the stages of a tool, and counts of what they produced.
+    Stages are timed with `with profiler.stage(name):` and may repeat (their time adds up) or nest.
+    Every hook is called with (stage name, seconds, peak bytes) when a stage ends, for tools that watch a build live.
+    A disabled profiler records nothing and costs a function call per stage"""
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}  # name -> {'seconds', 'calls', 'peak_bytes'}
+        self.counts = {}
+        self.hooks = []
+        self.peaks = []  # the peak of every running stage, innermost last
+        self.started_tracing = False
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start(self):
+        """Starts tracing memory allocations, unless something else already traces them"""
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def stage(self, name):
+        return self.timed_stage(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def timed_stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            self.enclose_peak()
+            tracemalloc.reset_peak()
+        self.peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1] if tracing else 0)
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], peak)  # the stage this one ran in peaked at least as high
+            record = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_bytes': 0})
+            record['seconds'] += seconds
+            record['calls'] += 1
+            record['peak_bytes'] = max(record['peak_bytes'], peak)
+            for hook in self.hooks:
+                hook(name, seconds, peak)
+
+    def enclose_peak(self):
+        """Keeps the peak the running stage reached so far, before the peak is reset for a nested stage"""
+        if self.peaks:
+            self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+
+    def count(self, name, amount):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, report):
+        """Adds the stages and counts of another profiler's report, a profiled worker process's for example"""
+        for name, other in report['stages'].items():
+            record = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_bytes': 0})
+            record['seconds'] += other['seconds']
+            record['calls'] += other['calls']
+            record['peak_bytes'] = max(record['peak_bytes'], other['peak_bytes'])
+        for name, amount in report['counts'].items():
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def report(self):
+        return {
+            'stages': self.stages,
+            'counts': self.counts,
+            'peak_bytes': max((record['peak_bytes'] for record in self.stages.values()), default=0),
+        }
+
+    def write_report(self, destination):
+        """Writes the report as JSON to the file destination, or prints it if destination is '-'"""
+        text = json.dumps(self.report(), indent=2, sort_keys=True)
+        if destination == '-':
+            print(text)
+            return
+        with open(destination, 'w') as file:
+            file.write(text + '\n')
+
+
+DISABLED = Profiler(enabled=False)  # the profiler of the tools that aren't profiled
@@ -0,0 +1,80 @@
+from typing import NamedTuple
+from VMCommand import VMCommand
+
+INCREMENTED_SEGMENTS = frozenset({'local', 'argument', 'this', 'that', 'static', 'pointer', 'temp'})
+POP_POINTER_THAT = VMCommand('pop', 'pointer', 1)
+PUSH_THAT = VMCommand('push', 'that', 0)
+POP_TEMP = VMCommand('pop', 'temp', 0)
+PUSH_TEMP = VMCommand('push', 'temp', 0)
+POP_THAT = VMCommand('pop', 'that', 0)
+
+
+class Superinstruction(NamedTuple):
+    """Commands fused into one. opcode is the name of the pattern they matched, which the translator dispatches on
+    like on a command's opcode"""
+    opcode: str
+    commands: tuple
+
+    def __str__(self) -> str:
+        return '; '.join(str(command) for command in self.commands)
+
+
+def match_increment(commands: list, index: int) -> int:
+    """push S i, push constant k, add/sub, pop S i: adds k to (or subtracts it from) S i in place"""
+    window = commands[index:index + 4]
+    if len(window) < 4:
+        return 0
+    push, constant, operation, pop = window
+    if (push.opcode == 'push' and push.segment in INCREMENTED_SEGMENTS and constant.opcode == 'push'
+            and constant.segment == 'constant' and operation.opcode in ('add', 'sub')
+            and pop == ('pop', push.segment, push.index)):
+        return 4
+    return 0
+
+
+def match_array_read(commands: list, index: int) -> int:
+    """push X (or add), pop pointer 1, push that 0: points THAT at the address on top of the stack and replaces the
+    address with the word it points at"""
+    window = commands[index:index + 3]
+    if (len(window) == 3 and window[1:] == [POP_POINTER_THAT, PUSH_THAT]
+            and (window[0].opcode == 'add' or window[0].opcode == 'push')):
+        return 3
+    return 0
+
+
+def match_array_write(commands: list, index: int) -> int:
+    """pop temp 0, pop pointer 1, push temp 0, pop that 0: stores the value on top of the stack at the address under
+    it, as a Jack array assignment does"""
+    return 4 if commands[index:index + 4] == [POP_TEMP, POP_POINTER_THAT, PUSH_TEMP, POP_THAT] else 0
+
+
+def match_not_if_goto(commands: list, index: int) -> int:
+    """not, if-goto L: jumps unless the top of the stack is true (-1), a while loop's exit test"""
+    window = commands[index:index + 2]
+    return 2 if len(window) == 2 and window[0].opcode == 'not' and window[1].opcode == 'if-goto' else 0
+
+
+# the patterns by the command they start with, the first that matches is fused
+PATTERNS = {
+    'push': [('increment', match_increment), ('array_read', match_array_read)],
+    'add': [('array_read', match_array_read)],
+    'pop': [('array_write', match_array_write)],
+    'not': [('not_if_goto', match_not_if_goto)],
+}
+
+
+def fuse(commands: list) -> list:
+    """Returns commands with every sequence that matches a pattern replaced by its Superinstruction"""
+    output = []
+    index = 0
+    while index < len(commands):
+        for name, match in PATTERNS.get(commands[index].opcode, ()):
+            length = match(commands, index)
+            if length:
+                output.append(Superinstruction(name, tuple(commands[index:index + length])))
+                index += length
+                break
+        else:
+            output.append(commands[index])
+            index += 1
+    return output
@@ -0,0 +1,22 @@
+from typing import NamedTuple
+
+
+class VMCommand(NamedTuple):
+    """A VM command split into its parts once. segment is the memory segment of push and pop, the label of label,
+    goto and if-goto and the function name of function and call. index is the segment index, the number of locals
+    of a function or the number of arguments of a call.
+    Commands are tuples, so they are equal and hash alike when their opcode, segment and index are"""
+    opcode: str
+    segment: str = None
+    index: int = None
+
+    @classmethod
+    def parse(cls, line: str) -> 'VMCommand':
+        """Parses a line stripped of its comment and surrounding whitespace"""
+        args = line.split()
+        if len(args) > 3:
+            raise Exception(f'Unknown command: {line}')
+        return cls(args[0], args[1] if len(args) > 1 else None, int(args[2]) if len(args) > 2 else None)
+
+    def __str__(self) -> str:
+        return ' '.join(str(arg) for arg in (self.opcode, self.segment, self.index) if arg is not None)